@@ -2,25 +2,143 @@ import asyncio
 import json
 import time
 import datetime
-import aiohttp
+import hashlib
+import transport
+import telemetry
+from brain_cache import BrainCache
+from context_builder import ContextBuilder
+from brain_stream import stream_generate, first_command_line, token_budget
 from database_manager import MissionVault
 from neural_shield import NeuralShield
+from manifest_index import ManifestIndex
+from result_parsers import get_parser
+from bridge_client import KaliBridgeClient
 from motivation_engine import MotivationEngine
+from settings import get_settings
 
-# --- CONFIGURATION ---
-OLLAMA_API_URL = "http://127.0.0.1:11434/api/generate"
-BRAIN_MODEL = "qwen2.5-coder:0.5b" 
-KALI_BRIDGE_URL = "http://127.0.0.1:9001/exec"
+# --- CONFIGURATION (config.yaml; see settings.FIELDS) ---
+SETTINGS = get_settings()  # Process-wide default; DeepNightmareApex reads everything from its own settings
+MAX_CONCURRENT_TASKS = SETTINGS["orchestrator.max_concurrent_tasks"]
+METRICS_HOST = "127.0.0.1"
+FAILURE_BACKOFF_MAX = 300  # Seconds; cap on the doubling hold after consecutive bridge failures
+# Hot-reloadable values (token budgets, temperatures, intervals) are read from self.settings at use
+
+class MissionScheduler:
+    """
+    Tracks in-flight tool tasks and bounds them with a semaphore. The brain
+    waits for a free slot before thinking, and wakes as soon as a task
+    makes progress rather than on a fixed timer. A task that returns False
+    failed: it does not wake the brain, and record_failure() holds dispatch
+    for a delay that doubles with each consecutive failure.
+    """
+    def __init__(self, max_concurrency=MAX_CONCURRENT_TASKS, idle_interval=None, saturation_backoff=None):
+        self.max_concurrency = max_concurrency
+        self.idle_interval = idle_interval or SETTINGS["orchestrator.idle_interval"]
+        self.saturation_backoff = (SETTINGS["orchestrator.saturation_backoff"]
+                                   if saturation_backoff is None else saturation_backoff)
+        self.failures = 0  # Consecutive failed tasks
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._saturated_until = 0.0
+
+    @property
+    def in_flight(self):
+        return len(self._tasks)
+
+    async def acquire_slot(self):
+        """Backpressure: blocks while every slot is busy or the bridge is saturated."""
+        loop = asyncio.get_running_loop()
+        while loop.time() < self._saturated_until:
+            await asyncio.sleep(self._saturated_until - loop.time())
+        await self._slots.acquire()
+
+    def release_slot(self):
+        """Returns a slot that was acquired but not used for a task."""
+        self._slots.release()
+
+    def spawn(self, coro):
+        """Runs coro in the slot acquired beforehand."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            print(f"\n[!] Task crashed: {task.exception()!r}")
+            self.record_failure()
+        elif task.result() is not False:
+            self._wakeup.set()
+
+    def mark_saturated(self, delay=None):
+        delay = self.saturation_backoff if delay is None else delay
+        loop = asyncio.get_running_loop()
+        self._saturated_until = max(self._saturated_until, loop.time() + delay)
+
+    def record_failure(self):
+        """Holds dispatch after a failed task, doubling the hold each time in a row. Returns the delay."""
+        self.failures += 1
+        delay = min(self.saturation_backoff * 2 ** (self.failures - 1), FAILURE_BACKOFF_MAX)
+        self.mark_saturated(delay)
+        return delay
+
+    def record_success(self):
+        self.failures = 0
+
+    async def wait_for_wakeup(self):
+        """Sleeps until a task completes or idle_interval passes."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.idle_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def shutdown(self):
+        """Cancels every in-flight task and waits for them to unwind."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 class DeepNightmareApex:
-    def __init__(self, target):
+    def __init__(self, target, vault_path=None, settings=SETTINGS):
         self.target = target
-        self.vault = MissionVault()
+        self.settings = settings
+        self.vault = MissionVault(vault_path or settings["vault.path"], write_behind=settings["vault.write_behind"],
+                                  queue_size=settings["vault.queue_size"], batch_size=settings["vault.batch_size"],
+                                  flush_interval=settings["vault.flush_interval"])
         self.shield = NeuralShield()
+        self.manifest = ManifestIndex('tool_manifest.json')
         self.motivator = MotivationEngine()
+        self.ollama = transport.get_pool(settings["network.ollama_url"], timeout=settings["network.brain_timeout"])
+        self.bridge_client = KaliBridgeClient(settings["network.bridge_host"], settings["network.bridge_port"],
+                                              timeout=settings["network.request_timeout"])  # Owns the bridge pool
         self.mission_id = None
         self.is_running = True
         self.last_success_time = datetime.datetime.now()
+        self.last_generation = {}  # Timing of the latest ask_qwen call
+        self.cache = BrainCache(self.vault, ttl=settings["brain.cache_ttl"])
+        self.brain_context = {}  # mission_id -> Ollama context tokens of the warmed-up preamble
+        self.context_builder = ContextBuilder(self.vault, settings["brain.context_token_budget"])  # Token-budgeted mission history
+        self.scheduler = MissionScheduler(settings["orchestrator.max_concurrent_tasks"],
+                                          settings["orchestrator.idle_interval"],
+                                          settings["orchestrator.saturation_backoff"])
+        self.metrics_runner = None
+        self.first_command = asyncio.Event()  # Set once the first command is dispatched (see preflight)
+        telemetry.REGISTRY.register_callback(
+            "deepnightmare_brain_cache_total", "Brain cache lookups by outcome.",
+            lambda: {(name,): count for name, count in self.cache.counters.items()},
+            kind="counter", labelnames=("result",))
+        telemetry.REGISTRY.register_callback(
+            "deepnightmare_tasks_in_flight", "Tool runs currently dispatched to the bridge.",
+            lambda: self.scheduler.in_flight)
+        if settings["orchestrator.record_spans"]:  # Also write every stage timing into the vault's spans table
+            telemetry.set_span_sink(self.vault.record_span)
 
     async def initialize_mission(self):
         """Sets up the mission and the 100-question intel tracking."""
@@ -37,32 +155,141 @@ class DeepNightmareApex:
             self.mission_id = cursor.fetchone()[0]
             print(f"[*] RESUMING MISSION {self.mission_id}")
 
-    async def ask_qwen(self, prompt, system_instruction):
-        """Direct communication with the Qwen2.5-Coder brain."""
+    async def warm_up_brain(self):
+        """
+        Loads the model and processes the mission preamble once. Later calls
+        continue from the returned context instead of re-reading the prefix.
+        """
         payload = {
-            "model": BRAIN_MODEL,
-            "prompt": f"{system_instruction}\n\nContext: {prompt}",
+            "model": self.settings["brain.model"],
+            "prompt": f"Mission target: {self.target}. You plan the next terminal command for this mission.",
             "stream": False,
-            "options": {"temperature": 0.2, "num_thread": 4}
+            "keep_alive": self.settings["brain.keep_alive"],  # Keeps the model and its KV cache resident
+            "options": dict(self.settings.ollama_options(), num_predict=1)
         }
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(OLLAMA_API_URL, json=payload, timeout=60) as resp:
-                    data = await resp.json()
-                    return data.get('response', '').strip()
-            except Exception as e:
-                return f"Error: {str(e)}"
+        try:
+            async with self.ollama.post("/api/generate", json=payload) as resp:
+                data = await resp.json()
+            self.brain_context[self.mission_id] = data.get('context')
+            print(f"[+] Brain warmed up ({len(data.get('context') or [])} context tokens cached)")
+        except Exception as e:
+            print(f"[!] Brain warm-up failed, continuing cold: {e}")
+
+    async def ask_qwen(self, prompt, system_instruction, stream=False, stop=(), fresh=False,
+                       context=None, max_tokens=None, role="executor"):
+        """
+        Direct communication with the Qwen2.5-Coder brain.
+        stream=True consumes tokens as they arrive and closes generation as
+        soon as one of the `stop` conditions (see brain_stream) fires.
+        context continues from tokens an earlier call returned (see
+        last_generation['context']), in which case prompt may be empty when
+        the context already holds it; max_tokens caps generation server-side.
+        role picks the config.yaml model temperature ("reasoner" or "executor").
+        Answers are cached; fresh=True skips the cache lookup. The key used is
+        left in last_generation['cache_key'] so a turn can invalidate it.
+        """
+        payload = {
+            "model": self.settings["brain.model"],
+            "prompt": f"{system_instruction}\n\nContext: {prompt}" if prompt else system_instruction,
+            "stream": False,
+            "keep_alive": self.settings["brain.keep_alive"],
+            "options": self.settings.ollama_options(role)
+        }
+        if context:
+            payload["context"] = context
+        if max_tokens:
+            payload["options"]["num_predict"] = max_tokens
+        variant = ",".join(getattr(c, "__name__", repr(c)) for c in stop) if stream else ""
+        if context:
+            variant += "|ctx:" + hashlib.sha256(json.dumps(context).encode()).hexdigest()
+        key = self.cache.make_key(self.settings["brain.model"], prompt, system_instruction, payload["options"], variant)
+        cached = self.cache.get(key, bypass=fresh)
+        if cached is not None:
+            self.last_generation = {"ttft_ms": 0.0, "total_ms": 0.0, "tokens": 0, "stopped_early": False,
+                                    "cached": True, "cache_key": key}
+            return cached
+
+        response = await self._generate(payload, stream, stop)
+        self.last_generation["cache_key"] = key
+        if not response.startswith("Error:"):
+            self.cache.put(key, response)
+        return response
+
+    async def _generate(self, payload, stream, stop):
+        try:
+            if stream:
+                text, self.last_generation = await stream_generate(self.ollama, payload, stop)
+                return text
+
+            start = time.perf_counter()
+            async with self.ollama.post("/api/generate", json=payload) as resp:
+                data = await resp.json()
+            total_ms = (time.perf_counter() - start) * 1000
+            self.last_generation = {"ttft_ms": total_ms, "total_ms": total_ms, "tokens": data.get('eval_count', 0),
+                                    "stopped_early": False, "context": data.get('context')}
+            return data.get('response', '').strip()
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    async def plan_command(self, prompt):
+        """
+        The two brain steps of a turn. The strategy runs to num_predict so
+        Ollama hands back its context; the command step then continues from
+        it with only the command instruction, since the strategy text is
+        already in that context. Without one (a cached strategy) the
+        strategy is sent as the prompt instead.
+        Returns (strategy, raw command, the strategy's cache key).
+        """
+        base_context = self.brain_context.get(self.mission_id)
+        with telemetry.stage("brain_strategy", mission_id=self.mission_id):
+            strategy = await self.ask_qwen(prompt, "Provide a brief strategy.", stream=True,
+                                           context=base_context, role="reasoner",
+                                           max_tokens=self.settings["brain.strategy_token_budget"])
+        strategy_key = self.last_generation.get('cache_key')
+        strategy_context = self.last_generation.get('context')
+        command_prompt = "" if strategy_context else f"Strategy: {strategy}"
+        with telemetry.stage("brain_command", mission_id=self.mission_id):
+            raw_command = await self.ask_qwen(command_prompt, "Output ONLY the bash command.",
+                                              stream=True, stop=[first_command_line, token_budget(self.settings["brain.command_token_budget"])],
+                                              context=strategy_context or base_context)
+        return strategy, raw_command, strategy_key
 
     async def run_mission(self):
+        try:
+            port = self.settings["network.metrics_port"]  # Prometheus scrape target for the apex (/metrics)
+            self.metrics_runner = await telemetry.start_metrics_server(METRICS_HOST, port)
+            print(f"[+] Metrics on http://{METRICS_HOST}:{port}/metrics")
+        except OSError as e:
+            print(f"[!] Metrics endpoint unavailable: {e}")
+        try:
+            await self._mission_loop()
+        finally:
+            await self.scheduler.shutdown()
+            await transport.close_all()
+            if self.metrics_runner is not None:
+                await self.metrics_runner.cleanup()
+
+    async def _mission_loop(self):
         await self.initialize_mission()
+        await self.warm_up_brain()
         
         while self.is_running:
+            # 0. BACKPRESSURE: only think when a tool slot is free
+            with telemetry.stage("slot_wait", span=False):  # Precedes the turn it unblocks
+                await self.scheduler.acquire_slot()
+
+            # Every stage of this turn, including the tool run it spawns, shares one trace
+            trace_id = telemetry.new_trace_id()
+            telemetry.current_trace.set(trace_id)
+
+            self.apply_settings(self.settings.refresh())
+
             # 1. ANALYZE CURRENT STATE (Vault Check)
             stats = self.vault.get_recon_stats(self.target)
             recon_pct = stats.get('recon_pct', 0)
 
             # PHASE LOGIC: Recon -> Vuln -> Exploit
-            if recon_pct < 90:
+            if recon_pct < self.settings["mission_profile.phase_gate_threshold"]:
                 goal = f"PHASE 1 (RECON): Identify WAF, DNS, and hosting. Current progress: {recon_pct}%."
                 instruction = "You are a lead recon specialist. Suggest the next terminal command."
             else:
@@ -71,53 +298,123 @@ class DeepNightmareApex:
 
             # 2. GENERATE COMMAND (Single Brain, Two-Step logic)
             print(f"[*] Brain is thinking (Recon: {recon_pct}%)...", end="\r")
-            strategy = await self.ask_qwen(goal, "Provide a brief strategy.")
-            raw_command = await self.ask_qwen(f"Strategy: {strategy}", "Output ONLY the bash command.")
+            with telemetry.stage("context_build", mission_id=self.mission_id):
+                prompt = self.context_builder.build(self.mission_id, goal, stats)
+            strategy, raw_command, strategy_key = await self.plan_command(prompt)
+            gen = self.last_generation
+            # A turn that logs nothing leaves the prompt unchanged; these keys let it forget its answers
+            turn_keys = (strategy_key, gen.get('cache_key'))
+            if gen.get('ttft_ms') is not None:
+                print(f"[*] Command generated: first token {gen['ttft_ms']:.0f} ms, total {gen['total_ms']:.0f} ms")
 
             # 3. NEURAL SHIELD VALIDATION
-            is_safe, final_cmd = self.shield.validate_command(raw_command, self.load_manifest())
+            with telemetry.stage("shield_validate", mission_id=self.mission_id):
+                is_safe, final_cmd = self.shield.validate_command(raw_command, self.load_manifest())
 
             if is_safe:
                 print(f"\n[PHASE {self.vault.get_phase(self.target)}] Strategy: {strategy[:80]}...")
                 print(f"[>] EXECUTING: {final_cmd}")
                 
                 # 4. ASYNC EXECUTION (Multi-Terminal Flow)
-                asyncio.create_task(self.execute_task(final_cmd, strategy))
+                self.scheduler.spawn(self.execute_task(final_cmd, strategy, trace_id, turn_keys))
+                self.first_command.set()
             else:
+                self.scheduler.release_slot()
+                telemetry.SHIELD_BLOCKS.inc()
+                self.cache.invalidate(*turn_keys)
                 print(f"\n[!] SHIELD BLOCKED: {raw_command}")
 
             # 5. MOTIVATION / STAGNATION CHECK
             await self.check_mission_status()
 
-            await asyncio.sleep(15) # Prevent CPU lockup
-
-    async def execute_task(self, cmd, strategy):
-        """Asynchronously runs command and updates database."""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(KALI_BRIDGE_URL, json={"command": cmd, "mission_id": self.mission_id}, timeout=300) as resp:
-                    result = await resp.json()
-                    stdout = result.get('stdout', '')
-                    
-                    # Log to Vault for Brain to read next cycle
-                    status = "Success" if "open" in stdout.lower() or "found" in stdout.lower() else "Finished"
-                    if status == "Success":
-                        self.last_success_time = datetime.datetime.now()
-
-                    self.vault.log_terminal_action(self.mission_id, "Qwen-Brain", cmd, self.shield.sanitize_output(stdout), status)
-                    print(f"\n[✔] TASK COMPLETE: {cmd[:20]}... Logged to Vault.")
-            except Exception as e:
-                print(f"[!] Bridge Error: {e}")
+            # 6. Sleep until a task finishes (or the idle interval passes)
+            await self.scheduler.wait_for_wakeup()
+
+    async def execute_task(self, cmd, strategy, trace_id=None, cache_keys=()):
+        """
+        Streams the command's output from the bridge, feeding it to the
+        manifest-selected result parser so findings reach the vault (and
+        recon progress moves) while the tool is still running. trace_id is
+        forwarded so the bridge's timings line up with this brain turn.
+        Returns False when the run failed (see MissionScheduler); the brain
+        answers behind it (cache_keys) are then invalidated.
+        """
+        tool = cmd.split()[0]
+        parser = get_parser(tool, self.manifest.output_type(tool))
+        gate_threshold = self.settings["mission_profile.phase_gate_threshold"]
+        stdout_chunks = []
+        findings_count = 0
+        exit_event = {}
+        try:
+            with telemetry.stage("bridge_round_trip", trace_id, self.mission_id):
+                async for event in self.bridge_client.stream_command(self.mission_id, cmd, trace_id=trace_id):
+                    if event.get("event") == "output" and event.get("stream") == "stdout":
+                        stdout_chunks.append(event["data"])
+                        if parser:
+                            findings = parser.feed(event["data"])
+                            findings_count += len(findings)
+                            self.vault.record_findings(self.mission_id, findings, gate_threshold)
+                    elif event.get("event") == "exit":
+                        exit_event = event
+        except Exception as e:
+            telemetry.BRIDGE_ERRORS.inc(kind="connection")
+            self.cache.invalidate(*cache_keys)
+            delay = self.scheduler.record_failure()
+            print(f"\n[!] Bridge Error: {e}. Holding dispatch for {delay:.0f}s.")
+            return False
+
+        if exit_event.get("http_status"):
+            telemetry.BRIDGE_ERRORS.inc(kind="saturated" if exit_event["http_status"] in (429, 503) else "http")
+        elif exit_event.get("timed_out"):
+            telemetry.BRIDGE_ERRORS.inc(kind="tool_timeout")
+        if exit_event.get("http_status"):
+            self.cache.invalidate(*cache_keys)
+        if exit_event.get("http_status") in (429, 503):
+            retry_after = float(exit_event.get("retry_after") or self.settings["orchestrator.saturation_backoff"])
+            self.scheduler.mark_saturated(retry_after)
+            print(f"\n[!] Bridge saturated, holding dispatch for {retry_after:.0f}s: {cmd[:20]}...")
+            return False
+        if exit_event.get("http_status"):
+            delay = self.scheduler.record_failure()
+            print(f"\n[!] Bridge Error: HTTP {exit_event['http_status']}. Holding dispatch for {delay:.0f}s.")
+            return False
+        self.scheduler.record_success()
+        if parser:
+            findings = parser.close()
+            findings_count += len(findings)
+            self.vault.record_findings(self.mission_id, findings, gate_threshold)
+
+        # Log to Vault for Brain to read next cycle
+        status = "Success" if findings_count else "Finished"
+        if status == "Success":
+            self.last_success_time = datetime.datetime.now()
+
+        stdout = "".join(stdout_chunks).strip()
+        self.vault.log_terminal_action(self.mission_id, "Qwen-Brain", cmd, self.shield.sanitize_output(stdout), status)
+        print(f"\n[✔] TASK COMPLETE: {cmd[:20]}... {findings_count} findings. Logged to Vault.")
+        return True
 
     async def check_mission_status(self):
         """Handles the 20-minute stagnation logic and 'BOOM' messages."""
         msg = self.motivator.get_status_message(self.last_success_time)
         print(f"[STATUS] {msg}")
+        cache = self.cache.stats()
+        print(f"[CACHE] hits {cache['memory_hits'] + cache['vault_hits']} / misses {cache['misses']} ({cache['hit_rate']:.0%})")
+
+    def apply_settings(self, changed):
+        """Pushes hot-reloaded config values into the long-lived components."""
+        if "brain.cache_ttl" in changed:
+            self.cache.ttl = changed["brain.cache_ttl"]
+        if "brain.context_token_budget" in changed:
+            self.context_builder.token_budget = changed["brain.context_token_budget"]
+        if "orchestrator.idle_interval" in changed:
+            self.scheduler.idle_interval = changed["orchestrator.idle_interval"]
+        if "orchestrator.saturation_backoff" in changed:
+            self.scheduler.saturation_backoff = changed["orchestrator.saturation_backoff"]
 
     def load_manifest(self):
-        try:
-            with open('tool_manifest.json', 'r') as f: return json.load(f)
-        except: return {"approved_tools": ["nmap", "sqlmap", "dirsearch", "wafw00f", "nikto", "curl"]}
+        """Compiled manifest index; only re-reads the file when its mtime changes."""
+        return self.manifest.refresh()
 
 if __name__ == "__main__":
     target = input("Enter target URL: ")
@@ -126,3 +423,5 @@ if __name__ == "__main__":
         asyncio.run(apex.run_mission())
     except KeyboardInterrupt:
         print("\n[!] Shutting down DeepNightmare...")
+    finally:
+        apex.vault.close()  # Drain the write-behind queue before exit
@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from aiohttp import web
+import telemetry
+import ares_apex
+from settings import Settings
+from database_manager import MissionVault
+from manifest_index import ManifestIndex
+from neural_shield import NeuralShield, benchmark_sanitizer
+
+BASELINE_PATH = "benchmark_baselines.json"
+DEFAULT_TOLERANCE = 0.25  # Relative slack before a metric counts as a regression
+# Metrics written by --update-baseline: name -> "higher" or "lower" is better
+BASELINE_METRICS = {
+    "loop_iterations_per_s": "higher",
+    "vault_writes_per_s": "higher",
+    "sanitizer_mb_s": "higher",
+    "sanitizer_stream_mb_s": "higher",
+    "stage_ms.brain_strategy.p50": "lower",
+    "stage_ms.bridge_round_trip.p50": "lower",
+}
+
+# --- STUBS ---
+
+class OllamaStub:
+    """
+    Stand-in for Ollama's /api/generate: streams `tokens` NDJSON chunks after
+    first_token_ms, token_ms apart, and returns a context like the real server:
+    derived from the prompt and incoming context, so a new turn never reuses
+    an old cache key. Strategy prompts get prose; command prompts get an
+    approved tool command.
+    """
+    def __init__(self, first_token_ms=20, token_ms=1, tokens=24, command="subfinder -d example.com -silent"):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.command = command
+        self.requests = 0
+
+    def _answer(self, prompt):
+        if "bash command" in prompt:
+            return [self.command, "\n"]
+        return [f"step{i} " for i in range(self.tokens)]
+
+    async def generate(self, request):
+        data = await request.json()
+        self.requests += 1
+        pieces = self._answer(data.get("prompt", ""))
+        await asyncio.sleep(self.first_token_ms / 1000)
+        digest = hashlib.sha256(json.dumps([data.get("prompt"), data.get("context")]).encode()).digest()
+        done = {"response": "", "done": True, "context": list(digest), "eval_count": len(pieces)}
+        if not data.get("stream", True):
+            await asyncio.sleep(self.token_ms * len(pieces) / 1000)
+            return web.json_response(dict(done, response="".join(pieces)))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        try:
+            await response.prepare(request)
+            for piece in pieces:
+                await response.write((json.dumps({"response": piece, "done": False}) + "\n").encode())
+                if self.token_ms:
+                    await asyncio.sleep(self.token_ms / 1000)
+            await response.write((json.dumps(done) + "\n").encode())
+        except ConnectionResetError:
+            pass  # The client hung up on a stop condition, as it does with real Ollama
+        return response
+
+    def routes(self):
+        return [web.post('/api/generate', self.generate)]
+
+class BridgeStub:
+    """
+    Stand-in for kali_bridge_server: /exec and /exec/stream answer after
+    tool_ms with output_kb of subdomain-list output, /status reports ONLINE.
+    """
+    def __init__(self, tool_ms=50, output_kb=16, chunk_kb=8):
+        self.tool_ms = tool_ms
+        self.output_kb = output_kb
+        self.chunk_kb = chunk_kb
+        self.requests = 0
+        self._counter = 0
+
+    def _output(self):
+        # Fresh hostnames every run so the vault keeps taking new findings
+        lines = []
+        size = 0
+        while size < self.output_kb * 1024:
+            self._counter += 1
+            line = f"host{self._counter}.bench.example.com\n"
+            lines.append(line)
+            size += len(line)
+        return "".join(lines)
+
+    async def execute(self, request):
+        data = await request.json()
+        self.requests += 1
+        await asyncio.sleep(self.tool_ms / 1000)
+        return web.json_response({"mission_id": data.get("mission_id"), "stdout": self._output(),
+                                  "stderr": "", "exit_code": 0, "timed_out": False})
+
+    async def stream(self, request):
+        data = await request.json()
+        self.requests += 1
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        output = self._output()
+        chunk = self.chunk_kb * 1024
+        pieces = [output[i:i + chunk] for i in range(0, len(output), chunk)] or [""]
+        try:
+            for piece in pieces:
+                await asyncio.sleep(self.tool_ms / 1000 / len(pieces))
+                await response.write((json.dumps({"event": "output", "stream": "stdout", "data": piece}) + "\n").encode())
+            await response.write((json.dumps({
+                "event": "exit", "mission_id": data.get("mission_id"), "trace_id": data.get("trace_id"),
+                "exit_code": 0, "timed_out": False, "stdout_tail": output[-1024:], "stderr_tail": "",
+                "stdout_bytes": len(output), "stderr_bytes": 0
+            }) + "\n").encode())
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # Mission stopped mid-run
+        return response
+
+    async def status(self, request):
+        return web.json_response({"status": "ONLINE", "service": "DeepNightmare Bridge (benchmark stub)"})
+
+    def routes(self):
+        return [web.post('/exec', self.execute), web.post('/exec/stream', self.stream), web.get('/status', self.status)]
+
+async def start_stub(routes):
+    """Serves routes on an ephemeral local port. Returns (runner, base_url)."""
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+# --- BENCHMARKS ---
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of numbers (q in 0..100)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def bench_mission(workdir, duration, ollama_stub, bridge_stub):
+    """Runs the real mission loop against the stubs for `duration` seconds."""
+    ollama_runner, ollama_url = await start_stub(ollama_stub.routes())
+    bridge_runner, bridge_url = await start_stub(bridge_stub.routes())
+    stage_samples = {}
+
+    def collect(trace_id, stage, mission_id, started_at, duration_ms, ok):
+        stage_samples.setdefault(stage, []).append(duration_ms)
+
+    bridge_host, bridge_port = bridge_url.split("//")[1].rsplit(":", 1)
+    environ = dict(os.environ, DEEPNIGHTMARE_NETWORK_OLLAMA_URL=ollama_url,
+                   DEEPNIGHTMARE_NETWORK_BRIDGE_HOST=bridge_host, DEEPNIGHTMARE_NETWORK_BRIDGE_PORT=bridge_port)
+    telemetry.set_span_sink(collect)
+    apex = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # The loop narrates every turn
+            apex = ares_apex.DeepNightmareApex("https://bench.example.com", os.path.join(workdir, "mission.db"),
+                                               settings=Settings(environ=environ))
+            task = asyncio.create_task(apex.run_mission())
+            await asyncio.sleep(duration)
+            apex.is_running = False
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    finally:
+        telemetry.set_span_sink(None)
+        if apex is not None:
+            apex.vault.close()
+        await ollama_runner.cleanup()
+        await bridge_runner.cleanup()
+
+    iterations = len(stage_samples.get("shield_validate", []))
+    return {
+        "loop_iterations": iterations,
+        "loop_iterations_per_s": round(iterations / duration, 2),
+        "tool_runs": bridge_stub.requests,
+        "brain_requests": ollama_stub.requests,
+        "stage_ms": {
+            stage: {"count": len(samples), "p50": round(percentile(samples, 50), 3),
+                    "p99": round(percentile(samples, 99), 3)}
+            for stage, samples in sorted(stage_samples.items())
+        },
+    }
+
+def bench_vault(workdir, writes=5000, output_kb=4):
+    """Write-behind throughput: terminal logs plus findings, flushed to disk."""
+    path = os.path.join(workdir, "vault_bench.db")
+    for suffix in ("", "-wal", "-shm"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + suffix)  # Every repeat starts from an empty vault
+    vault = MissionVault(path, write_behind=True)
+    with vault.conn:
+        mission_id = vault.conn.execute(
+            "INSERT INTO missions (target_url, start_date, current_phase) VALUES (?, ?, ?)",
+            ("https://bench.example.com", time.time(), 1)).lastrowid
+    output = "x" * (output_kb * 1024)
+    start = time.perf_counter()
+    for i in range(writes // 2):
+        vault.log_terminal_action(mission_id, "bench", f"subfinder -d {i}.example.com", f"{i}:{output}", "Finished")
+        vault.record_findings(mission_id, [{"kind": "subdomain", "hostname": f"h{i}.bench.example.com"}])
+    vault.flush()
+    elapsed = time.perf_counter() - start
+    vault.close()
+    return {"vault_writes": writes, "vault_writes_per_s": round(writes / elapsed, 1)}
+
+def bench_shield(size_mb):
+    results = benchmark_sanitizer(size_mb=size_mb)
+    shield = NeuralShield()
+    index = ManifestIndex.from_data({"approved_tools": ["nmap", "subfinder", "httpx"]})
+    commands = ["nmap -sV example.com", "subfinder -d example.com | httpx -silent", "rm -rf / ; nmap x"] * 2000
+    start = time.perf_counter()
+    for command in commands:
+        shield.validate_command(command, index)
+    validate_us = (time.perf_counter() - start) * 1e6 / len(commands)
+    return {"sanitizer_mb_s": results["single_pass_mb_s"], "sanitizer_stream_mb_s": results["streaming_mb_s"],
+            "validate_command_us": round(validate_us, 2)}
+
+async def run_benchmarks(args):
+    with tempfile.TemporaryDirectory(prefix="deepnightmare_bench_") as workdir:
+        results = {"config": {"duration_s": args.duration, "first_token_ms": args.first_token_ms,
+                              "token_ms": args.token_ms, "tool_ms": args.tool_ms, "output_kb": args.output_kb,
+                              "repeat": args.repeat}}
+        results.update(await bench_mission(
+            workdir, args.duration,
+            OllamaStub(args.first_token_ms, args.token_ms),
+            BridgeStub(args.tool_ms, args.output_kb)))
+        # CPU-bound micro-benchmarks are noisy; the best of several runs is stable enough to compare
+        results.update(best_of(args.repeat, lambda: bench_vault(workdir, args.vault_writes)))
+        results.update(best_of(args.repeat, lambda: bench_shield(args.sanitizer_mb)))
+    return results
+
+def best_of(repeat, run):
+    """Runs a benchmark `repeat` times and keeps each metric's best value (highest rate, lowest latency)."""
+    runs = [run() for _ in range(max(1, repeat))]
+    best = dict(runs[0])
+    for key in best:
+        values = [result[key] for result in runs]
+        if key.endswith(("_per_s", "_mb_s")):
+            best[key] = max(values)
+        elif key.endswith(("_us", "_ms")):
+            best[key] = min(values)
+    return best
+
+# --- BASELINES ---
+
+def lookup(results, dotted):
+    value = results
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def compare(results, baselines, tolerance):
+    """Returns a list of regression descriptions (empty when within tolerance)."""
+    regressions = []
+    for name, entry in baselines.get("metrics", {}).items():
+        current = lookup(results, name)
+        if current is None:
+            regressions.append(f"{name}: missing from results")
+            continue
+        baseline, direction = entry["value"], entry["better"]
+        if direction == "higher" and current < baseline * (1 - tolerance):
+            regressions.append(f"{name}: {current} < baseline {baseline} (-{tolerance:.0%} allowed)")
+        elif direction == "lower" and current > baseline * (1 + tolerance):
+            regressions.append(f"{name}: {current} > baseline {baseline} (+{tolerance:.0%} allowed)")
+    return regressions
+
+def make_baselines(results, tolerance):
+    return {
+        "tolerance": tolerance,
+        "config": results["config"],
+        "metrics": {name: {"value": lookup(results, name), "better": better}
+                    for name, better in BASELINE_METRICS.items() if lookup(results, name) is not None},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline DeepNightmare throughput benchmark (no model or Kali box needed).")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run the mission loop")
+    parser.add_argument("--first-token-ms", type=float, default=20, help="Stub model latency before the first token")
+    parser.add_argument("--token-ms", type=float, default=1, help="Stub model delay between tokens")
+    parser.add_argument("--tool-ms", type=float, default=50, help="Stub tool runtime per command")
+    parser.add_argument("--output-kb", type=int, default=16, help="Stub tool output size per command")
+    parser.add_argument("--vault-writes", type=int, default=5000)
+    parser.add_argument("--sanitizer-mb", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each CPU-bound benchmark; the best counts")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=None, help="Overrides the baseline file's tolerance")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmarks(args))
+
+    if args.update_baseline:
+        tolerance = args.tolerance if args.tolerance is not None else DEFAULT_TOLERANCE
+        with open(args.baseline, "w") as f:
+            json.dump(make_baselines(results, tolerance), f, indent=2)
+            f.write("\n")
+        results["baseline"] = {"updated": args.baseline}
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+        tolerance = args.tolerance if args.tolerance is not None else baselines.get("tolerance", DEFAULT_TOLERANCE)
+        regressions = compare(results, baselines, tolerance)
+        results["baseline"] = {"path": args.baseline, "tolerance": tolerance, "regressions": regressions}
+    print(json.dumps(results, indent=2))
+    return 1 if results.get("baseline", {}).get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+class BrainCache:
+    """
+    Two-tier cache for brain responses: an in-memory LRU in front of the
+    vault's brain_cache table. Entries expire after ttl seconds; each tier
+    evicts least recently used entries once it grows past its byte budget.
+    """
+    def __init__(self, vault, ttl=900, max_memory_entries=256, max_memory_bytes=1_000_000,
+                 max_vault_bytes=16_000_000):
+        self.vault = vault
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_vault_bytes = max_vault_bytes
+        self._memory = OrderedDict()  # key -> (response, created_at)
+        self._memory_bytes = 0
+        self._invalidated = set()  # Keys whose vault row may not be deleted yet (write-behind)
+        self.counters = {"memory_hits": 0, "vault_hits": 0, "misses": 0, "bypassed": 0, "stores": 0,
+                         "invalidated": 0}
+
+    @staticmethod
+    def make_key(model, prompt, system_instruction, options, variant=""):
+        """Stable key over everything that shapes the model's answer."""
+        material = json.dumps([model, prompt, system_instruction, options, variant], sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key, bypass=False):
+        if bypass:
+            self.counters["bypassed"] += 1
+            return None
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            response, created_at = entry
+            if time.time() - created_at < self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return response
+            self._drop(key)
+
+        response = None if key in self._invalidated else self.vault.get_cached_response(key, self.ttl)
+        if response is not None:
+            self._remember(key, response, time.time())
+            self.counters["vault_hits"] += 1
+            return response
+
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, key, response):
+        self._invalidated.discard(key)
+        self._remember(key, response, time.time())
+        self.vault.put_cached_response(key, response, self.max_vault_bytes, self.ttl)
+        self.counters["stores"] += 1
+
+    def invalidate(self, *keys):
+        """Forgets answers that led nowhere (a blocked or failed command) so the model is asked again."""
+        for key in keys:
+            if key is None:
+                continue
+            self._drop(key)
+            self._invalidated.add(key)
+            self.vault.drop_cached_response(key)
+            self.counters["invalidated"] += 1
+
+    def stats(self):
+        hits = self.counters["memory_hits"] + self.counters["vault_hits"]
+        lookups = hits + self.counters["misses"]
+        return dict(self.counters, hit_rate=(hits / lookups) if lookups else 0.0,
+                    memory_entries=len(self._memory), memory_bytes=self._memory_bytes)
+
+    def _remember(self, key, response, created_at):
+        self._drop(key)
+        self._memory[key] = (response, created_at)
+        self._memory_bytes += len(response.encode())
+        while self._memory and (len(self._memory) > self.max_memory_entries
+                                or self._memory_bytes > self.max_memory_bytes):
+            self._drop(next(iter(self._memory)))
+
+    def _drop(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[0].encode())
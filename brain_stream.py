@@ -0,0 +1,68 @@
+import json
+import time
+
+# --- STOP CONDITIONS ---
+# A stop condition is called with (text_so_far, token_count) after every token.
+# Return None to keep generating, or the final text to close generation now.
+
+def first_command_line(text, token_count):
+    """Stops at the first complete, non-empty line that is not a code fence."""
+    if "\n" not in text:
+        return None
+    for line in text.split("\n")[:-1]:  # The last piece is still being written
+        line = line.strip().strip("`").strip()
+        if line and line not in ("bash", "sh", "shell"):
+            return line
+    return None
+
+def token_budget(limit):
+    """Stops once `limit` tokens have been generated."""
+    def condition(text, token_count):
+        return text if token_count >= limit else None
+    condition.__name__ = f"token_budget_{limit}"  # Distinct names keep cache keys distinct
+    return condition
+
+# --- NDJSON CONSUMER ---
+
+async def stream_generate(pool, payload, stop_conditions=(), timeout=None):
+    """
+    Posts a streaming /api/generate request and consumes Ollama's NDJSON
+    token stream. Returns (text, stats); stats carries ttft_ms, total_ms,
+    tokens, stopped_early and the final chunk's context when Ollama sent one.
+    """
+    payload = dict(payload, stream=True)
+    stats = {"ttft_ms": None, "total_ms": None, "tokens": 0, "stopped_early": False, "context": None}
+    pieces = []
+    start = time.perf_counter()
+
+    async with pool.post("/api/generate", json=payload, timeout=timeout) as resp:
+        async for line in resp.content:
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+
+            token = chunk.get("response", "")
+            if token:
+                if stats["ttft_ms"] is None:
+                    stats["ttft_ms"] = (time.perf_counter() - start) * 1000
+                pieces.append(token)
+                stats["tokens"] += 1
+
+            if chunk.get("done"):
+                stats["context"] = chunk.get("context")
+                break
+
+            text = "".join(pieces)
+            for condition in stop_conditions:
+                final = condition(text, stats["tokens"])
+                if final is not None:
+                    # Dropping the connection makes Ollama abort the generation
+                    resp.close()
+                    stats["stopped_early"] = True
+                    stats["total_ms"] = (time.perf_counter() - start) * 1000
+                    return final.strip(), stats
+
+    stats["total_ms"] = (time.perf_counter() - start) * 1000
+    return "".join(pieces).strip(), stats
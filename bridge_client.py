@@ -1,62 +1,107 @@
-import requests
 import json
 import logging
 import asyncio
-import aiohttp
+import transport
+import telemetry
+from settings import get_settings
+
+JOB_TERMINAL_STATES = ("finished", "failed", "interrupted", "timed_out")  # Mirrors the bridge's job states
 
 class KaliBridgeClient:
-    def __init__(self, host="127.0.0.1", port=9001):
-        self.base_url = f"http://{host}:{port}"
-        self.timeout = 600  # 10 minutes for deep scans
+    def __init__(self, host=None, port=None, timeout=None):
+        settings = get_settings()
+        self.base_url = f"http://{host or settings['network.bridge_host']}:{port or settings['network.bridge_port']}"
+        self.timeout = timeout or settings["network.request_timeout"]  # 10 minutes for deep scans by default
+        self.pool = transport.get_pool(self.base_url, owner=self, timeout=self.timeout)
         
     async def check_connection(self):
         """Verifies the Kali Bridge is active before starting mission."""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(f"{self.base_url}/status", timeout=5) as resp:
-                    return resp.status_code == 200
-            except:
-                return False
-
-    async def send_command_async(self, mission_id, command):
+        try:
+            async with self.pool.get("/status", timeout=5) as resp:
+                return resp.status == 200
+        except:
+            return False
+
+    async def send_command_async(self, mission_id, command, callback_url=None):
         """
         Non-blocking command dispatch. 
         Allows the Brain to keep working while Kali runs the tool.
+        Returns the bridge's reply, whose 'job_id' feeds get_job/read_job_output.
         """
         payload = {
             "mission_id": mission_id,
             "command": command,
-            "async_mode": True  # Tells the server to spawn a new terminal window
+            "async_mode": True,  # Tells the server to spool the run as a background job
+            "callback_url": callback_url
         }
         
         print(f"[BRIDGE] 🚀 Spawning Terminal in Kali: {command}")
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/exec", 
-                    json=payload, 
-                    timeout=self.timeout
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data
-                    else:
-                        return {"stdout": "", "stderr": f"Bridge Error: {resp.status}"}
-            except asyncio.TimeoutError:
-                return {"stdout": "", "stderr": "Error: Command timed out on Kali side."}
-            except Exception as e:
-                return {"stdout": "", "stderr": f"Bridge Connection Failed: {str(e)}"}
+        try:
+            async with self.pool.post("/exec", json=payload) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    return data
+                else:
+                    return {"stdout": "", "stderr": f"Bridge Error: {resp.status}"}
+        except asyncio.TimeoutError:
+            return {"stdout": "", "stderr": "Error: Command timed out on Kali side."}
+        except Exception as e:
+            return {"stdout": "", "stderr": f"Bridge Connection Failed: {str(e)}"}
+
+    async def get_job(self, job_id):
+        """Status record of an async job (status, exit_code, output sizes)."""
+        async with self.pool.get(f"/jobs/{job_id}", timeout=30) as resp:
+            return await resp.json()
+
+    async def read_job_output(self, job_id, stream="stdout", offset=0, limit=65536):
+        """One page of a job's spooled output; pass back 'next_offset' to continue."""
+        params = {"stream": stream, "offset": offset, "limit": limit}
+        async with self.pool.get(f"/jobs/{job_id}/result", params=params, timeout=30) as resp:
+            return await resp.json()
+
+    async def wait_for_job(self, job_id, poll_interval=2.0):
+        """Polls until the job reaches a terminal state and returns its status."""
+        while True:
+            job = await self.get_job(job_id)
+            if "status" not in job or job["status"] in JOB_TERMINAL_STATES:  # No status: unknown job
+                return job
+            await asyncio.sleep(poll_interval)
+
+    async def stream_command(self, mission_id, command, trace_id=None):
+        """
+        Async iterator over the bridge's streaming exec. Yields event dicts:
+        {"event": "output", "stream": "stdout"|"stderr", "data": ...} while the
+        tool runs, then one {"event": "exit", "exit_code": ..., ...} at the end.
+        trace_id (default: the current brain turn's) is sent in X-Trace-Id.
+        """
+        trace_id = trace_id or telemetry.current_trace.get()
+        payload = {"mission_id": mission_id, "command": command, "trace_id": trace_id}
+        headers = {telemetry.TRACE_HEADER: trace_id} if trace_id else None
+        async with self.pool.post("/exec/stream", json=payload, headers=headers) as resp:
+            if resp.status != 200:
+                yield {"event": "exit", "exit_code": None, "stdout_tail": "",
+                       "stderr_tail": f"Bridge Error: {resp.status}", "http_status": resp.status,
+                       "retry_after": resp.headers.get("Retry-After")}
+                return
+            async for line in resp.content:
+                if line.strip():
+                    yield json.loads(line)
 
     def send_command_sync(self, mission_id, command):
         """Standard blocking call for quick verification commands."""
         payload = {"mission_id": mission_id, "command": command}
         try:
-            response = requests.post(f"{self.base_url}/exec", json=payload, timeout=30)
+            response = self.pool.post_sync("/exec", json=payload, timeout=30)
             return response.json()
         except Exception as e:
             return {"stdout": "", "stderr": str(e)}
 
+    async def close(self):
+        """Releases the pooled connections to the bridge, unless another component shares the pool."""
+        if self.pool.owner is self:
+            await self.pool.close()
+
 # Professional Implementation Note:
 # Use 'send_command_async' for Phase 1 & 2 tools (nmap, ffuf, subfinder).
 # Use 'send_command_sync' for Phase 3 exploitation steps that need immediate feedback.
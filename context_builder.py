@@ -0,0 +1,91 @@
+CHARS_PER_TOKEN = 4          # Rough estimate for English/command text with Qwen's tokenizer
+CONTEXT_TOKEN_BUDGET = 768   # Leaves room in the 2048 window for the preamble and the answer
+RECENT_COMMANDS_KEPT = 20    # Per-mission history lines kept in the rolling summary
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class ContextBuilder:
+    """
+    Keeps a rolling per-mission summary of terminal_logs in the vault,
+    folding in only rows it has not seen yet, and assembles brain prompts
+    that never exceed token_budget however long the mission runs.
+    """
+    def __init__(self, vault, token_budget=CONTEXT_TOKEN_BUDGET):
+        self.vault = vault
+        self.token_budget = token_budget
+        self._summaries = {}   # mission_id -> (summary, last_log_id)
+        self._prefix_cache = {}  # mission_id -> (state key, assembled prefix)
+
+    def _load(self, mission_id):
+        if mission_id not in self._summaries:
+            summary, last_log_id = self.vault.get_mission_summary(mission_id)
+            self._summaries[mission_id] = (summary or {"tools": {}, "recent": []}, last_log_id)
+        return self._summaries[mission_id]
+
+    def update(self, mission_id):
+        """Folds new terminal_logs rows into the summary. Returns the summary."""
+        summary, last_log_id = self._load(mission_id)
+        rows = self.vault.get_logs_since(mission_id, last_log_id)
+        if not rows:
+            return summary
+
+        for row in rows:
+            command = row["command_executed"] or ""
+            tool = command.split()[0] if command.strip() else "?"
+            tally = summary["tools"].setdefault(tool, {"runs": 0, "success": 0})
+            tally["runs"] += 1
+            tally["success"] += row["status"] == "Success"
+            summary["recent"].append(f"{command[:120]} -> {row['status']}")
+        del summary["recent"][:-RECENT_COMMANDS_KEPT]
+
+        last_log_id = rows[-1]["id"]
+        self._summaries[mission_id] = (summary, last_log_id)
+        self.vault.save_mission_summary(mission_id, summary, last_log_id)
+        return summary
+
+    def build(self, mission_id, goal, recon_stats=None):
+        """Returns the mission history prefix plus `goal`, within token_budget."""
+        self.update(mission_id)
+        summary, last_log_id = self._summaries[mission_id]
+        findings = self.vault.get_findings_summary(mission_id)
+        recon_stats = recon_stats or {}
+        state_key = (last_log_id, self.token_budget, tuple(sorted(findings.items())),
+                     recon_stats.get("waf_type"), recon_stats.get("hosting_provider"))
+
+        cached = self._prefix_cache.get(mission_id)
+        if cached is None or cached[0] != state_key:
+            budget = self.token_budget - estimate_tokens(goal) - 1
+            cached = (state_key, self._assemble(summary, findings, recon_stats, budget))
+            self._prefix_cache[mission_id] = cached
+        prefix = cached[1]
+        return f"{prefix}\n{goal}" if prefix else goal
+
+    def _assemble(self, summary, findings, recon_stats, budget):
+        # Highest-value lines first; stop as soon as the budget is spent
+        lines = []
+        known = [f"WAF: {recon_stats['waf_type']}" if recon_stats.get("waf_type") else None,
+                 f"Hosting: {recon_stats['hosting_provider']}"
+                 if recon_stats.get("hosting_provider") not in (None, "", "Unknown") else None,
+                 "Findings: " + ", ".join(f"{count} {kind}" for kind, count in findings.items() if count)
+                 if any(findings.values()) else None]
+        lines.extend(line for line in known if line)
+        if summary["tools"]:
+            lines.append("Tools run: " + ", ".join(
+                f"{tool} x{t['runs']} ({t['success']} ok)" for tool, t in sorted(summary["tools"].items())))
+        recent = [f"- {entry}" for entry in reversed(summary["recent"])]
+        if recent:
+            lines.append("Recent commands (newest first):")
+            lines.extend(recent)
+
+        kept = []
+        used = 0
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        if kept and kept[-1] == "Recent commands (newest first):":
+            kept.pop()
+        return "\n".join(kept)
@@ -2,56 +2,312 @@ import sqlite3
 import datetime
 import json
 import hashlib
+import codecs
+import queue
+import threading
+import zlib
+import time
+import telemetry
+
+_STOP = object()  # Sentinel telling the writer thread to exit
+SUBMIT_TIMEOUT = 1.0  # Seconds a producer waits on a full queue before writing inline
+MIGRATION_BATCH_ROWS = 200  # terminal_logs rows held in memory at once while moving output to blobs
+
+# --- SCHEMA MIGRATIONS ---
+
+def _migration_base_schema(conn):
+    # Table 1: Primary Target & Phase Management
+    conn.execute('''CREATE TABLE IF NOT EXISTS missions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        target_url TEXT UNIQUE,
+        current_phase INTEGER DEFAULT 1,
+        recon_pct INTEGER DEFAULT 0,
+        waf_type TEXT,
+        hosting_provider TEXT,
+        start_date TIMESTAMP,
+        last_update TIMESTAMP
+    )''')
+
+    # Table 2: The "100 Questions" Intel (JSON Blob for flexibility)
+    conn.execute('''CREATE TABLE IF NOT EXISTS intel_payloads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mission_id INTEGER,
+        category TEXT, 
+        data_json TEXT,
+        integrity_hash TEXT,
+        FOREIGN KEY(mission_id) REFERENCES missions(id)
+    )''')
+
+    # Table 3: Multi-Terminal Audit Logs
+    conn.execute('''CREATE TABLE IF NOT EXISTS terminal_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mission_id INTEGER,
+        brain_source TEXT, 
+        command_executed TEXT,
+        raw_output TEXT,
+        status TEXT, 
+        timestamp TIMESTAMP
+    )''')
+
+def _migration_hot_path_indexes(conn):
+    # Older vaults may hold duplicate categories from racing writers: keep the newest
+    conn.execute('''DELETE FROM intel_payloads WHERE id NOT IN (
+        SELECT MAX(id) FROM intel_payloads GROUP BY mission_id, category
+    )''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_intel_mission_category ON intel_payloads (mission_id, category)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_terminal_logs_mission_ts ON terminal_logs (mission_id, timestamp DESC)")
+
+def _migration_output_blobs(conn):
+    # Raw tool output lives once per content hash, zlib-compressed
+    conn.execute('''CREATE TABLE IF NOT EXISTS output_blobs (
+        hash TEXT PRIMARY KEY,
+        data BLOB,
+        raw_size INTEGER,
+        stored_size INTEGER
+    )''')
+    conn.execute("ALTER TABLE terminal_logs ADD COLUMN output_hash TEXT")
+    conn.execute("ALTER TABLE terminal_logs ADD COLUMN output_size INTEGER")
+    conn.execute("ALTER TABLE terminal_logs ADD COLUMN stored_size INTEGER")
+
+    # Walks the logs in id order a batch at a time so big outputs never all sit in memory
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, raw_output FROM terminal_logs WHERE id > ? AND raw_output IS NOT NULL ORDER BY id LIMIT ?",
+            (last_id, MIGRATION_BATCH_ROWS)
+        ).fetchall()
+        if not rows:
+            break
+        for log_id, raw_output in rows:
+            digest, raw_size, stored_size = _store_output_blob(conn, raw_output)
+            conn.execute(
+                "UPDATE terminal_logs SET raw_output = NULL, output_hash = ?, output_size = ?, stored_size = ? WHERE id = ?",
+                (digest, raw_size, stored_size, log_id)
+            )
+        last_id = rows[-1][0]
+
+def _store_output_blob(conn, output):
+    """Compresses output into output_blobs unless identical bytes are already stored."""
+    raw = (output or "").encode("utf-8", errors="replace")
+    digest = hashlib.sha256(raw).hexdigest()
+    row = conn.execute("SELECT stored_size FROM output_blobs WHERE hash = ?", (digest,)).fetchone()
+    if row:
+        return digest, len(raw), row[0]
+    packed = zlib.compress(raw, 6)
+    conn.execute(
+        "INSERT INTO output_blobs (hash, data, raw_size, stored_size) VALUES (?, ?, ?, ?)",
+        (digest, packed, len(raw), len(packed))
+    )
+    return digest, len(raw), len(packed)
+
+def _migration_intel_facts(conn):
+    # One row per intel key replaces the read-modify-write JSON blob per category
+    conn.execute('''CREATE TABLE IF NOT EXISTS intel_facts (
+        mission_id INTEGER,
+        category TEXT,
+        key TEXT,
+        value_json TEXT,
+        integrity_hash TEXT,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (mission_id, category, key),
+        FOREIGN KEY(mission_id) REFERENCES missions(id)
+    )''')
+
+    now = datetime.datetime.now()
+    for mission_id, category, data_json in conn.execute(
+            "SELECT mission_id, category, data_json FROM intel_payloads").fetchall():
+        try:
+            data = json.loads(data_json or "{}")
+        except ValueError:
+            data = {"_legacy_blob": data_json}
+        if not isinstance(data, dict):
+            data = {"_legacy_blob": data}
+        conn.executemany(_INTEL_UPSERT_SQL, _intel_rows(mission_id, category, data, now))
+    conn.execute("DROP TABLE intel_payloads")
+
+def _intel_hash(key, value_json):
+    return hashlib.sha256(f"{key}\0{value_json}".encode()).hexdigest()
+
+def _intel_rows(mission_id, category, mapping, timestamp):
+    for key, value in mapping.items():
+        value_json = json.dumps(value)
+        yield (mission_id, category, str(key), value_json, _intel_hash(key, value_json), timestamp)
+
+_INTEL_UPSERT_SQL = '''INSERT INTO intel_facts (mission_id, category, key, value_json, integrity_hash, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (mission_id, category, key) DO UPDATE SET
+        value_json = excluded.value_json, integrity_hash = excluded.integrity_hash,
+        updated_at = excluded.updated_at'''
+
+def _migration_brain_cache(conn):
+    # Persistent tier of brain_cache.BrainCache
+    conn.execute('''CREATE TABLE IF NOT EXISTS brain_cache (
+        key TEXT PRIMARY KEY,
+        response TEXT,
+        size INTEGER,
+        created_at REAL,
+        last_used REAL
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_brain_cache_last_used ON brain_cache (last_used)")
+
+# kind -> (table, key columns, value columns) for result_parsers findings
+FINDING_TABLES = {
+    "subdomain": ("findings_subdomains", ("hostname",), ()),
+    "port": ("findings_ports", ("host", "port", "protocol"), ("service", "product", "version")),
+    "web": ("findings_web", ("url",), ("status_code", "title", "webserver", "tech", "cdn")),
+    "path": ("findings_paths", ("url",), ("status_code", "length")),
+}
+
+def _migration_findings(conn):
+    # Structured results fed by result_parsers as tool output streams in
+    for table, keys, values in FINDING_TABLES.values():
+        columns = ", ".join(f"{c} TEXT" if c not in ("port", "status_code", "length") else f"{c} INTEGER"
+                            for c in keys + values)
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+            mission_id INTEGER,
+            {columns},
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP,
+            PRIMARY KEY (mission_id, {", ".join(keys)})
+        )''')
+
+def _finding_upsert_sql(kind):
+    table, keys, values = FINDING_TABLES[kind]
+    columns = ("mission_id",) + keys + values + ("first_seen", "last_seen")
+    updates = ", ".join(f"{c} = excluded.{c}" for c in values + ("last_seen",))
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (mission_id, {', '.join(keys)}) DO UPDATE SET {updates}")
+
+def _migration_mission_summaries(conn):
+    # Rolling brain-context summary maintained by context_builder.ContextBuilder
+    conn.execute('''CREATE TABLE IF NOT EXISTS mission_summaries (
+        mission_id INTEGER PRIMARY KEY,
+        summary_json TEXT,
+        last_log_id INTEGER,
+        updated_at TIMESTAMP,
+        FOREIGN KEY(mission_id) REFERENCES missions(id)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_terminal_logs_mission_id ON terminal_logs (mission_id, id)")
+
+def _migration_spans(conn):
+    # Optional per-stage timing records, written when telemetry's span sink is the vault
+    conn.execute('''CREATE TABLE IF NOT EXISTS spans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        trace_id TEXT,
+        stage TEXT,
+        mission_id INTEGER,
+        started_at REAL,
+        duration_ms REAL,
+        ok INTEGER
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_spans_trace ON spans (trace_id)")
+
+# Each recon signal that has been observed is worth this many percent
+RECON_WEIGHTS = {"subdomains": 20, "web": 20, "ports": 20, "waf": 20, "hosting": 20}
+PHASE_GATE_THRESHOLD = 90  # Default recon_pct that moves a mission to Phase 2 (config: mission_profile.phase_gate_threshold)
+
+# (version, description, callable) -- append only, never renumber
+MIGRATIONS = [
+    (1, "base schema", _migration_base_schema),
+    (2, "hot path indexes and unique intel category", _migration_hot_path_indexes),
+    (3, "content-addressed compressed tool output", _migration_output_blobs),
+    (4, "per-key intel facts", _migration_intel_facts),
+    (5, "persistent brain response cache", _migration_brain_cache),
+    (6, "structured tool findings", _migration_findings),
+    (7, "rolling mission summaries", _migration_mission_summaries),
+    (8, "latency spans", _migration_spans),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_BRAIN_CONTEXT_SQL = "SELECT brain_source, command_executed, status FROM terminal_logs WHERE mission_id = ? ORDER BY timestamp DESC LIMIT 5"
+_RECON_STATS_SQL = "SELECT recon_pct, waf_type, hosting_provider, current_phase FROM missions WHERE target_url = ?"
+_LOGS_SINCE_SQL = "SELECT id, command_executed, status, output_size FROM terminal_logs WHERE mission_id = ? AND id > ? ORDER BY id"
+_INTEL_LOOKUP_SQL = "SELECT key, value_json, integrity_hash FROM intel_facts WHERE mission_id = ? AND category = ?"
+
+# Getters that run every brain loop; check_query_plans() verifies they stay indexed
+HOT_QUERIES = {
+    "brain_context": (_BRAIN_CONTEXT_SQL, (0,)),
+    "recon_stats": (_RECON_STATS_SQL, ("",)),
+    "intel_lookup": (_INTEL_LOOKUP_SQL, (0, "")),
+    "logs_since": (_LOGS_SINCE_SQL, (0, 0)),
+}
 
 class MissionVault:
-    def __init__(self, db_path="deepnightmare_vault.db"):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+    def __init__(self, db_path="deepnightmare_vault.db", write_behind=False,
+                 queue_size=10000, batch_size=256, flush_interval=0.5):
+        """
+        write_behind=True routes log/intel writes through a bounded queue
+        drained by a single writer thread that groups them into batched
+        transactions. Call flush() or close() before exit so nothing is lost.
+        """
+        self.db_path = db_path
+        self.conn = self._connect()
         self.conn.row_factory = sqlite3.Row  # Allows accessing columns by name
-        self._create_tables()
+        self._migrate()
 
-    def _create_tables(self):
-        with self.conn:
-            # Table 1: Primary Target & Phase Management
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS missions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                target_url TEXT UNIQUE,
-                current_phase INTEGER DEFAULT 1,
-                recon_pct INTEGER DEFAULT 0,
-                waf_type TEXT,
-                hosting_provider TEXT,
-                start_date TIMESTAMP,
-                last_update TIMESTAMP
-            )''')
-
-            # Table 2: The "100 Questions" Intel (JSON Blob for flexibility)
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS intel_payloads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mission_id INTEGER,
-                category TEXT, 
-                data_json TEXT,
-                integrity_hash TEXT,
-                FOREIGN KEY(mission_id) REFERENCES missions(id)
-            )''')
-
-            # Table 3: Multi-Terminal Audit Logs
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS terminal_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mission_id INTEGER,
-                brain_source TEXT, 
-                command_executed TEXT,
-                raw_output TEXT,
-                status TEXT, 
-                timestamp TIMESTAMP
-            )''')
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = None
+        self._writer = None
+        if write_behind:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._writer = threading.Thread(target=self._writer_loop, name="vault-writer", daemon=True)
+            self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        # WAL lets readers keep going while the writer commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _migrate(self):
+        """Brings the vault schema up to SCHEMA_VERSION, one migration per transaction."""
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP
+        )''')
+        for version, description, migration in MIGRATIONS:
+            if version <= self.schema_version():
+                continue
+            # BEGIN IMMEDIATE also serializes two processes opening the same vault
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version > self.schema_version():
+                    migration(self.conn)
+                    self.conn.execute(
+                        "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                        (version, description, datetime.datetime.now())
+                    )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def schema_version(self):
+        row = self.conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+
+    def check_query_plans(self):
+        """
+        Runs EXPLAIN QUERY PLAN over the hot getters.
+        Returns {name: (uses_index, plan_detail)} so callers can catch full scans.
+        """
+        report = {}
+        for name, (sql, params) in HOT_QUERIES.items():
+            rows = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            detail = "; ".join(row[3] for row in rows)
+            uses_index = "USING" in detail and "TEMP B-TREE" not in detail
+            report[name] = (uses_index, detail)
+        return report
 
     # --- CORE MISSION GETTERS ---
 
     def get_recon_stats(self, target_url):
         """Fetches recon data for ares_apex phase gating."""
-        cursor = self.conn.execute(
-            "SELECT recon_pct, waf_type, hosting_provider, current_phase FROM missions WHERE target_url = ?", 
-            (target_url,)
-        )
+        cursor = self.conn.execute(_RECON_STATS_SQL, (target_url,))
         row = cursor.fetchone()
         return dict(row) if row else {"recon_pct": 0, "waf_type": "None", "hosting_provider": "Unknown", "current_phase": 1}
 
@@ -63,63 +319,351 @@ class MissionVault:
     # --- INTEL & PROGRESS LOGIC ---
 
     def update_intel_question(self, mission_id, category, key, value):
-        """Updates the flexible JSON intel payloads and secures with hash."""
-        with self.conn:
-            cursor = self.conn.execute(
-                "SELECT data_json FROM intel_payloads WHERE mission_id = ? AND category = ?", 
-                (mission_id, category)
-            )
-            row = cursor.fetchone()
-            
-            if row:
-                data = json.loads(row['data_json'])
-                data[key] = value
-                new_json = json.dumps(data)
-                h = hashlib.sha256(new_json.encode()).hexdigest()
-                self.conn.execute(
-                    "UPDATE intel_payloads SET data_json = ?, integrity_hash = ? WHERE mission_id = ? AND category = ?",
-                    (new_json, h, mission_id, category)
-                )
-            else:
-                initial_data = json.dumps({key: value})
-                h = hashlib.sha256(initial_data.encode()).hexdigest()
-                self.conn.execute(
-                    "INSERT INTO intel_payloads (mission_id, category, data_json, integrity_hash) VALUES (?, ?, ?, ?)",
-                    (mission_id, category, initial_data, h)
-                )
-
-    def update_recon_progress(self, target_url, waf, provider, percentage):
+        """Updates a single intel answer and secures it with a hash."""
+        self.update_intel_many(mission_id, category, {key: value})
+
+    def update_intel_many(self, mission_id, category, mapping):
+        """Upserts several intel answers of one category in a single write."""
+        rows = list(_intel_rows(mission_id, category, mapping, datetime.datetime.now()))
+        if rows:
+            self._submit(self._write_intel_facts, rows)
+
+    @staticmethod
+    def _write_intel_facts(conn, rows):
+        conn.executemany(_INTEL_UPSERT_SQL, rows)
+
+    def get_intel(self, mission_id, category, verify=False):
+        """
+        Returns one intel category as a dict. With verify=True, keys whose
+        stored hash no longer matches their value are dropped and reported.
+        """
+        intel = {}
+        for key, value_json, integrity_hash in self.conn.execute(_INTEL_LOOKUP_SQL, (mission_id, category)):
+            if verify and _intel_hash(key, value_json) != integrity_hash:
+                print(f"[!] Intel integrity mismatch: mission {mission_id} {category}.{key}")
+                continue
+            intel[key] = json.loads(value_json)
+        return intel
+
+    def update_recon_progress(self, target_url, waf, provider, percentage, gate_threshold=PHASE_GATE_THRESHOLD):
         """Standard progress update. Signals when to advance to Phase 2."""
         now = datetime.datetime.now()
-        new_phase = 2 if percentage >= 90 else 1
+        new_phase = 2 if percentage >= gate_threshold else 1
         with self.conn:
             self.conn.execute('''UPDATE missions SET 
                 waf_type = ?, hosting_provider = ?, recon_pct = ?, current_phase = ?, last_update = ? 
                 WHERE target_url = ?''', (waf, provider, percentage, new_phase, now, target_url))
         
-        if percentage >= 90:
+        if percentage >= gate_threshold:
             print(f"[*] GATE SIGNAL: {target_url} reached {percentage}%. Advancing to Phase 2.")
             return True
         return False
 
+    # --- STRUCTURED FINDINGS ---
+
+    def record_findings(self, mission_id, findings, gate_threshold=PHASE_GATE_THRESHOLD):
+        """Stores parsed findings and re-derives the mission's recon progress from them."""
+        if findings:
+            self._submit(self._write_findings, mission_id, list(findings), datetime.datetime.now(), gate_threshold)
+
+    @staticmethod
+    def _write_findings(conn, mission_id, findings, now, gate_threshold=PHASE_GATE_THRESHOLD):
+        rows = {}
+        for finding in findings:
+            kind = finding["kind"]
+            if kind == "waf":
+                conn.execute("UPDATE missions SET waf_type = ? WHERE id = ?", (finding["waf"], mission_id))
+            elif kind == "hosting":
+                conn.execute("UPDATE missions SET hosting_provider = ? WHERE id = ?", (finding["provider"], mission_id))
+            elif kind in FINDING_TABLES:
+                _, keys, values = FINDING_TABLES[kind]
+                rows.setdefault(kind, []).append(
+                    (mission_id,) + tuple(finding.get(c) for c in keys + values) + (now, now))
+        for kind, batch in rows.items():
+            conn.executemany(_finding_upsert_sql(kind), batch)
+        MissionVault._write_recon_progress(conn, mission_id, now, gate_threshold)
+
+    @staticmethod
+    def _write_recon_progress(conn, mission_id, now, gate_threshold=PHASE_GATE_THRESHOLD):
+        row = conn.execute(
+            "SELECT target_url, recon_pct, current_phase, waf_type, hosting_provider FROM missions WHERE id = ?",
+            (mission_id,)
+        ).fetchone()
+        if row is None:
+            return
+        target_url, old_pct, phase, waf, provider = row
+        observed = {
+            "subdomains": conn.execute("SELECT EXISTS (SELECT 1 FROM findings_subdomains WHERE mission_id = ?)", (mission_id,)).fetchone()[0],
+            "web": conn.execute("SELECT EXISTS (SELECT 1 FROM findings_web WHERE mission_id = ?)", (mission_id,)).fetchone()[0],
+            "ports": conn.execute("SELECT EXISTS (SELECT 1 FROM findings_ports WHERE mission_id = ?)", (mission_id,)).fetchone()[0],
+            "waf": waf is not None,
+            "hosting": provider is not None,
+        }
+        percentage = max(old_pct or 0, sum(w for signal, w in RECON_WEIGHTS.items() if observed[signal]))
+        if percentage == (old_pct or 0):
+            return
+        new_phase = max(phase or 1, 2 if percentage >= gate_threshold else 1)
+        conn.execute("UPDATE missions SET recon_pct = ?, current_phase = ?, last_update = ? WHERE id = ?",
+                     (percentage, new_phase, now, mission_id))
+        if percentage >= gate_threshold > (old_pct or 0):
+            print(f"[*] GATE SIGNAL: {target_url} reached {percentage}%. Advancing to Phase 2.")
+
+    def get_findings_summary(self, mission_id):
+        """Counts of each structured finding kind for a mission."""
+        return {
+            kind: self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE mission_id = ?", (mission_id,)).fetchone()[0]
+            for kind, (table, _, _) in FINDING_TABLES.items()
+        }
+
     # --- BRAIN SYNC & LOGGING ---
 
     def log_terminal_action(self, mission_id, brain, command, output, status):
         """Records terminal output so Qwen can read history in the next cycle."""
-        with self.conn:
-            self.conn.execute('''INSERT INTO terminal_logs 
-                (mission_id, brain_source, command_executed, raw_output, status, timestamp) 
-                VALUES (?, ?, ?, ?, ?, ?)''', 
-                (mission_id, brain, command, output, status, datetime.datetime.now()))
+        self._submit(self._write_terminal_action, mission_id, brain, command, output, status,
+                     datetime.datetime.now())
+
+    @staticmethod
+    def _write_terminal_action(conn, mission_id, brain, command, output, status, timestamp):
+        digest, raw_size, stored_size = _store_output_blob(conn, output)
+        conn.execute('''INSERT INTO terminal_logs 
+            (mission_id, brain_source, command_executed, output_hash, output_size, stored_size, status, timestamp) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', 
+            (mission_id, brain, command, digest, raw_size, stored_size, status, timestamp))
+
+    def get_output(self, log_id):
+        """Returns the full tool output of one terminal_logs row."""
+        return "".join(self.iter_output(log_id))
+
+    def iter_output(self, log_id, chunk_size=65536):
+        """
+        Streams a logged output back as text chunks. The compressed blob is
+        read and inflated piecewise, so big scans never sit in memory whole.
+        """
+        row = self.conn.execute(
+            "SELECT raw_output, output_hash FROM terminal_logs WHERE id = ?", (log_id,)
+        ).fetchone()
+        if row is None:
+            return
+        if row["output_hash"] is None:
+            if row["raw_output"]:
+                yield row["raw_output"]
+            return
+
+        blob_row = self.conn.execute(
+            "SELECT rowid FROM output_blobs WHERE hash = ?", (row["output_hash"],)
+        ).fetchone()
+        if blob_row is None:
+            return
+
+        inflater = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for packed in self._iter_blob(blob_row[0], chunk_size):
+            data = inflater.decompress(packed, chunk_size)
+            while data:
+                yield decoder.decode(data)
+                data = inflater.decompress(inflater.unconsumed_tail, chunk_size) if inflater.unconsumed_tail else b""
+        tail = decoder.decode(inflater.flush(), final=True)
+        if tail:
+            yield tail
+
+    def _iter_blob(self, rowid, chunk_size):
+        if hasattr(self.conn, "blobopen"):  # Python 3.11+: incremental BLOB I/O
+            with self.conn.blobopen("output_blobs", "data", rowid, readonly=True) as blob:
+                while True:
+                    packed = blob.read(chunk_size)
+                    if not packed:
+                        break
+                    yield packed
+        else:
+            row = self.conn.execute("SELECT data FROM output_blobs WHERE rowid = ?", (rowid,)).fetchone()
+            packed = row[0]
+            for i in range(0, len(packed), chunk_size):
+                yield packed[i:i + chunk_size]
 
     def get_brain_context(self, mission_id):
         """Retrieves history for the Brain to analyze past successes/failures."""
+        cursor = self.conn.execute(_BRAIN_CONTEXT_SQL, (mission_id,))
+        return [dict(row) for row in cursor.fetchall()]
+
+    # --- BRAIN RESPONSE CACHE ---
+
+    def get_cached_response(self, key, ttl):
+        """Returns a cached brain response younger than ttl seconds, else None."""
+        row = self.conn.execute(
+            "SELECT response FROM brain_cache WHERE key = ? AND created_at >= ?", (key, time.time() - ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        self._submit(self._touch_cached_response, key, time.time())
+        return row[0]
+
+    def put_cached_response(self, key, response, max_bytes, ttl):
+        """Stores a brain response, then trims expired rows and the least recently used past max_bytes."""
+        self._submit(self._write_cached_response, key, response, max_bytes, ttl, time.time())
+
+    def drop_cached_response(self, key):
+        self._submit(self._delete_cached_response, key)
+
+    @staticmethod
+    def _delete_cached_response(conn, key):
+        conn.execute("DELETE FROM brain_cache WHERE key = ?", (key,))
+
+    @staticmethod
+    def _touch_cached_response(conn, key, now):
+        conn.execute("UPDATE brain_cache SET last_used = ? WHERE key = ?", (now, key))
+
+    @staticmethod
+    def _write_cached_response(conn, key, response, max_bytes, ttl, now):
+        conn.execute('''INSERT OR REPLACE INTO brain_cache (key, response, size, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?)''', (key, response, len(response.encode()), now, now))
+        conn.execute("DELETE FROM brain_cache WHERE created_at < ?", (now - ttl,))
+        conn.execute('''DELETE FROM brain_cache WHERE key IN (
+            SELECT key FROM (
+                SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running FROM brain_cache
+            ) WHERE running > ?
+        )''', (max_bytes,))
+
+    # --- ROLLING MISSION SUMMARY ---
+
+    def get_mission_summary(self, mission_id):
+        """Returns (summary dict, last folded terminal_logs id) or (None, 0)."""
+        row = self.conn.execute(
+            "SELECT summary_json, last_log_id FROM mission_summaries WHERE mission_id = ?", (mission_id,)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, 0)
+
+    def save_mission_summary(self, mission_id, summary, last_log_id):
+        self._submit(self._write_mission_summary, mission_id, json.dumps(summary), last_log_id,
+                     datetime.datetime.now())
+
+    @staticmethod
+    def _write_mission_summary(conn, mission_id, summary_json, last_log_id, now):
+        conn.execute('''INSERT INTO mission_summaries (mission_id, summary_json, last_log_id, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (mission_id) DO UPDATE SET
+                summary_json = excluded.summary_json, last_log_id = excluded.last_log_id,
+                updated_at = excluded.updated_at''', (mission_id, summary_json, last_log_id, now))
+
+    def get_logs_since(self, mission_id, last_log_id):
+        """terminal_logs rows newer than last_log_id, oldest first (no output bodies)."""
+        cursor = self.conn.execute(_LOGS_SINCE_SQL, (mission_id, last_log_id))
+        return [dict(row) for row in cursor.fetchall()]
+
+    # --- LATENCY SPANS ---
+
+    def record_span(self, trace_id, stage, mission_id, started_at, duration_ms, ok):
+        """Span sink for telemetry.set_span_sink()."""
+        self._submit(self._write_span, trace_id, stage, mission_id, started_at, duration_ms, ok)
+
+    @staticmethod
+    def _write_span(conn, trace_id, stage, mission_id, started_at, duration_ms, ok):
+        conn.execute("INSERT INTO spans (trace_id, stage, mission_id, started_at, duration_ms, ok) VALUES (?, ?, ?, ?, ?, ?)",
+                     (trace_id, stage, mission_id, started_at, duration_ms, int(ok)))
+
+    def get_trace(self, trace_id):
+        """Spans of one brain turn in start order."""
         cursor = self.conn.execute(
-            "SELECT brain_source, command_executed, status FROM terminal_logs WHERE mission_id = ? ORDER BY timestamp DESC LIMIT 5", 
-            (mission_id,)
-        )
+            "SELECT stage, mission_id, started_at, duration_ms, ok FROM spans WHERE trace_id = ? ORDER BY started_at",
+            (trace_id,))
         return [dict(row) for row in cursor.fetchall()]
 
+    # --- WRITE-BEHIND QUEUE ---
+
+    def _submit(self, op, *args):
+        """Runs a write op now, or hands it to the writer thread in write-behind mode."""
+        if self._writer is not None and self._writer.is_alive():
+            try:
+                # Bounded wait: producers include the event-loop thread
+                self._queue.put((op, args), timeout=SUBMIT_TIMEOUT)
+                return
+            except queue.Full:
+                print(f"[!] Vault queue full for {SUBMIT_TIMEOUT}s; writing {op.__name__} inline")
+        with telemetry.stage("vault_commit", span=False), self.conn:
+            op(self.conn, *args)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            ops = []
+            for entry in batch:
+                if entry is _STOP:
+                    stopping = True
+                else:
+                    ops.append(entry)
+            try:
+                self._commit_batch(conn, ops)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _commit_batch(self, conn, ops):
+        if not ops:
+            return
+        try:
+            with telemetry.stage("vault_commit", span=False), conn:
+                for op, args in ops:
+                    op(conn, *args)
+        except Exception:
+            # One bad row must not take the rest of the batch (or the thread) down with it
+            for op, args in ops:
+                try:
+                    with conn:
+                        op(conn, *args)
+                except Exception as e:
+                    print(f"[!] Vault writer dropped {op.__name__}: {type(e).__name__}: {e}")
+
+    def _writer_lost(self):
+        """Reports writes stranded by a writer thread that is no longer running."""
+        pending = self._queue.unfinished_tasks
+        if pending:
+            print(f"[!] Vault writer is not running; {pending} queued write(s) were lost")
+
+    def flush(self):
+        """Blocks until every queued write has been committed (or the writer has died)."""
+        if self._writer is None:
+            return
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                if not self._writer.is_alive():
+                    break
+                self._queue.all_tasks_done.wait(self.flush_interval)
+        if not self._writer.is_alive():
+            self._writer_lost()
+
+    def close(self):
+        """Flushes pending writes, stops the writer thread and closes the vault."""
+        if self._writer is not None:
+            while self._writer.is_alive():
+                try:
+                    self._queue.put(_STOP, timeout=self.flush_interval)
+                    break
+                except queue.Full:
+                    continue
+            self._writer.join()
+            self._writer_lost()
+            self._writer = None
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 # --- INITIALIZATION HELPER ---
 def start_new_mission(target):
     vault = MissionVault()
@@ -2,10 +2,325 @@ import asyncio
 import json
 import subprocess
 import datetime
+import codecs
+import os
+import shlex
+import signal
+import resource
+import itertools
+import uuid
+import time
+from collections import deque
+import aiohttp
 from aiohttp import web
+import telemetry
+from settings import get_settings
 
-HOST = '127.0.0.1'
-PORT = 9001
+SETTINGS = get_settings()     # config.yaml 'network' and 'bridge' sections
+HOST = SETTINGS["network.bridge_host"]
+PORT = SETTINGS["network.bridge_port"]
+STREAM_READ_CHUNK = 8 * 1024   # Keeps every NDJSON line well under aiohttp's line limit
+STREAM_TAIL_BYTES = 64 * 1024  # Output kept per stream for the final summary
+# Per-job spool (meta.json, stdout.log, stderr.log, exit_code); relative paths are taken from this file's directory
+JOBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), SETTINGS["bridge.jobs_dir"])
+JOB_PAGE_BYTES = 64 * 1024
+JOB_POLL_INTERVAL = 1.0        # How often jobs adopted after a restart are checked
+JOB_TERMINAL_STATES = ("finished", "failed", "interrupted", "timed_out")
+
+# --- EXECUTOR LIMITS ---
+WORKER_SLOTS = SETTINGS["bridge.worker_slots"]          # Tools running at once
+MAX_QUEUE_DEPTH = SETTINGS["bridge.max_queue_depth"]    # Beyond this /exec answers 503 so the apex backs off
+DEFAULT_PRIORITY = 5           # Lower runs sooner
+TOOL_TIMEOUT = SETTINGS["bridge.tool_timeout"]          # Wall-clock seconds before the whole process group is killed
+RLIMIT_CPU_SECONDS = SETTINGS["bridge.rlimit_cpu_seconds"]
+RLIMIT_AS_BYTES = int(SETTINGS["bridge.rlimit_as_gb"] * 1024 ** 3)
+
+class BridgeExecutor:
+    """
+    Fixed pool of worker slots fed by a priority queue. Every tool runs in
+    its own session with CPU/address-space rlimits, and a wall-clock timeout
+    kills its whole process group.
+    """
+    def __init__(self, slots=WORKER_SLOTS, max_queue=MAX_QUEUE_DEPTH, timeout=TOOL_TIMEOUT,
+                 cpu_seconds=RLIMIT_CPU_SECONDS, address_space=RLIMIT_AS_BYTES):
+        self.slots = slots
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.address_space = address_space
+        self.busy = 0
+        self.timed_out = 0
+        self._queue = asyncio.PriorityQueue(maxsize=max_queue)
+        self._seq = itertools.count()  # FIFO among equal priorities
+        self._workers = []
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.slots)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, runner, priority=DEFAULT_PRIORITY):
+        """
+        Queues `runner` (an async callable) for the next free slot and returns
+        a future of its result. Raises asyncio.QueueFull when saturated.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._seq), time.perf_counter(), runner, future))
+        return future
+
+    async def _worker(self):
+        while True:
+            _, _, queued_at, runner, future = await self._queue.get()
+            if future.cancelled():  # Caller gave up while queued
+                continue
+            telemetry.STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="bridge_queue_wait")
+            self.busy += 1
+            try:
+                future.set_result(await runner())
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.busy -= 1
+
+    def _apply_limits(self):
+        # Runs in the child between fork and exec
+        resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_AS, (self.address_space, self.address_space))
+
+    async def spawn(self, command, **kwargs):
+        return await asyncio.create_subprocess_shell(
+            command, start_new_session=True, preexec_fn=self._apply_limits, **kwargs
+        )
+
+    async def run_with_timeout(self, process, awaitable, timeout=None):
+        """Awaits `awaitable`; on timeout kills the process group. Returns True if it timed out."""
+        try:
+            await asyncio.wait_for(awaitable, timeout or self.timeout)
+            return False
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            kill_process_group(process.pid)
+            await process.wait()
+            return True
+
+    def stats(self):
+        return {"slots": self.slots, "busy": self.busy, "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize, "timed_out": self.timed_out}
+
+def kill_process_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+executor = BridgeExecutor()
+
+telemetry.REGISTRY.register_callback(
+    "deepnightmare_bridge_workers", "Executor slots and queue depth.",
+    lambda: {(name,): value for name, value in executor.stats().items()}, labelnames=("field",))
+SATURATED = telemetry.REGISTRY.counter("deepnightmare_bridge_saturated_total", "Exec requests refused with 503.")
+
+def _saturated_response():
+    SATURATED.inc()
+    return web.json_response({"error": "Bridge saturated", "workers": executor.stats()},
+                             status=503, headers={"Retry-After": "5"})
+
+class TailBuffer:
+    """Ring buffer that keeps only the last `limit` bytes written to it."""
+    def __init__(self, limit=STREAM_TAIL_BYTES):
+        self.limit = limit
+        self.total = 0
+        self._chunks = deque()
+        self._size = 0
+
+    def write(self, data):
+        self._chunks.append(data)
+        self._size += len(data)
+        self.total += len(data)
+        while self._chunks and self._size - len(self._chunks[0]) >= self.limit:
+            self._size -= len(self._chunks.popleft())
+
+    def getvalue(self):
+        return b"".join(self._chunks)[-self.limit:]
+
+class JobRegistry:
+    """
+    Async-mode executions. Each job spools its output straight to disk and
+    runs in its own session, so it keeps going (and stays readable) across
+    a bridge restart; the wrapper shell records the exit code on its own.
+    """
+    def __init__(self, root=JOBS_DIR):
+        self.root = os.path.abspath(root)
+        self.jobs = {}
+        os.makedirs(root, exist_ok=True)
+        for job_id in os.listdir(root):
+            meta_path = os.path.join(root, job_id, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    self.jobs[job_id] = json.load(f)
+
+    def _path(self, job_id, name):
+        return os.path.join(self.root, job_id, name)
+
+    def _save(self, meta):
+        tmp_path = self._path(meta["job_id"], "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(meta["job_id"], "meta.json"))
+
+    def submit(self, command, mission_id, callback_url=None, priority=DEFAULT_PRIORITY, trace_id=None):
+        """Queues a job on the executor; raises asyncio.QueueFull when saturated."""
+        job_id = uuid.uuid4().hex
+        meta = {
+            "job_id": job_id,
+            "mission_id": mission_id,
+            "trace_id": trace_id,
+            "command": command,
+            "status": "queued",
+            "exit_code": None,
+            "callback_url": callback_url,
+            "priority": priority,
+            "created_at": datetime.datetime.now().isoformat(),
+            "finished_at": None
+        }
+        self._enqueue(meta)
+        os.makedirs(os.path.join(self.root, job_id))
+        self.jobs[job_id] = meta
+        self._save(meta)
+        return meta
+
+    def _enqueue(self, meta):
+        future = executor.submit(lambda: self._run(meta["job_id"]), meta.get("priority", DEFAULT_PRIORITY))
+        future.add_done_callback(lambda f: self._run_done(meta["job_id"], f))
+
+    def _run_done(self, job_id, future):
+        # Cancelled means the bridge is shutting down; resume() picks the job up next start
+        if future.cancelled() or future.exception() is None:
+            return
+        meta = self.jobs[job_id]
+        if meta["status"] in JOB_TERMINAL_STATES:
+            return
+        error = future.exception()
+        print(f"[!] Background Task crashed: {meta['command'][:30]}... ({type(error).__name__}: {error})")
+        if meta["status"] == "running" and _pid_alive(meta.get("pid")):
+            # The tool itself is still going; let the wrapper's exit code decide
+            asyncio.create_task(self._watch_orphan(job_id, meta["pid"]))
+            return
+        meta["status"] = "failed"
+        meta["error"] = f"{type(error).__name__}: {error}"
+        meta["finished_at"] = datetime.datetime.now().isoformat()
+        self._save(meta)
+        if meta.get("callback_url"):
+            asyncio.create_task(self._notify(meta))
+
+    async def resume(self):
+        """Adopts jobs a previous bridge process left running and requeues unstarted ones."""
+        for job_id, meta in self.jobs.items():
+            if meta["status"] == "running":
+                asyncio.create_task(self._watch_orphan(job_id, meta.get("pid")))
+            elif meta["status"] == "queued":
+                try:
+                    self._enqueue(meta)
+                except asyncio.QueueFull:
+                    self._finish(job_id)
+
+    async def _run(self, job_id):
+        meta = self.jobs[job_id]
+        # The newline before ')' keeps a trailing '# comment' from swallowing it
+        wrapped = (f"( {meta['command']}\n) > {shlex.quote(self._path(job_id, 'stdout.log'))} "
+                   f"2> {shlex.quote(self._path(job_id, 'stderr.log'))}; "
+                   f"echo $? > {shlex.quote(self._path(job_id, 'exit_code'))}")
+        process = await executor.spawn(wrapped, stdin=asyncio.subprocess.DEVNULL)
+        meta["status"] = "running"
+        meta["pid"] = process.pid
+        self._save(meta)
+        with telemetry.stage("tool_runtime", meta.get("trace_id"), meta["mission_id"]):
+            meta["timed_out"] = await executor.run_with_timeout(process, process.wait())
+        self._finish(job_id)
+
+    async def _watch_orphan(self, job_id, pid):
+        while not os.path.exists(self._path(job_id, "exit_code")) and _pid_alive(pid):
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        self._finish(job_id)
+
+    def _finish(self, job_id):
+        meta = self.jobs[job_id]
+        try:
+            with open(self._path(job_id, "exit_code")) as f:
+                meta["exit_code"] = int(f.read().strip())
+            meta["status"] = "finished" if meta["exit_code"] == 0 else "failed"
+        except (OSError, ValueError):
+            # Killed before the wrapper could record an exit code
+            meta["status"] = "timed_out" if meta.get("timed_out") else "interrupted"
+        meta["finished_at"] = datetime.datetime.now().isoformat()
+        for stream in ("stdout", "stderr"):
+            path = self._path(job_id, f"{stream}.log")
+            meta[f"{stream}_bytes"] = os.path.getsize(path) if os.path.exists(path) else 0
+        self._save(meta)
+        print(f"[✔] Background Task {meta['status'].title()}: {meta['command'][:30]}... (Mission: {meta['mission_id']})")
+        if meta.get("callback_url"):
+            asyncio.create_task(self._notify(meta))
+
+    async def _notify(self, meta):
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(meta["callback_url"], json=meta, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    await resp.read()
+        except Exception as e:
+            print(f"[!] Job callback failed for {meta['job_id']}: {e}")
+
+    def read(self, job_id, stream, offset, limit):
+        """One page of a job's spooled output, by byte offset."""
+        path = self._path(job_id, f"{stream}.log")
+        if not os.path.exists(path):
+            return {"data": "", "offset": offset, "next_offset": offset,
+                    "eof": self.jobs[job_id]["status"] in JOB_TERMINAL_STATES}
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read(limit)
+            size = os.fstat(f.fileno()).st_size
+        chunk = chunk[:_utf8_boundary(chunk)]  # The next page starts on the split character
+        next_offset = offset + len(chunk)
+        return {
+            "data": chunk.decode(errors='ignore'),
+            "offset": offset,
+            "next_offset": next_offset,
+            "eof": next_offset >= size and self.jobs[job_id]["status"] in JOB_TERMINAL_STATES
+        }
+
+def _utf8_boundary(chunk):
+    """Length of chunk without a trailing, incomplete UTF-8 sequence."""
+    for back in range(1, min(4, len(chunk)) + 1):
+        byte = chunk[-back]
+        if byte & 0xC0 != 0x80:  # Found the lead byte (or plain ASCII)
+            needed = 4 if byte >= 0xF0 else 3 if byte >= 0xE0 else 2 if byte >= 0xC0 else 1
+            # A page holding nothing but the partial character is returned as is, so reads always advance
+            return len(chunk) - back if needed > back and back < len(chunk) else len(chunk)
+    return len(chunk)
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+jobs = None  # JobRegistry, created on startup so importing this module touches no files
+
+def _trace_id(request, data):
+    """The apex's brain-turn trace ID, from the X-Trace-Id header or the payload."""
+    return request.headers.get(telemetry.TRACE_HEADER) or data.get("trace_id")
 
 async def execute_tool(request):
     """
@@ -16,51 +331,170 @@ async def execute_tool(request):
     command = data.get("command")
     mission_id = data.get("mission_id")
     is_async = data.get("async_mode", False)
+    trace_id = _trace_id(request, data)
 
-    print(f"[*] [{datetime.datetime.now().strftime('%H:%M:%S')}] Mission {mission_id} -> {command}")
+    print(f"[*] [{datetime.datetime.now().strftime('%H:%M:%S')}] Mission {mission_id} -> {command} (trace {trace_id})")
+
+    priority = data.get("priority", DEFAULT_PRIORITY)
+    timeout = data.get("timeout")
 
     if is_async:
-        # FIRE-AND-FORGET: Start the process and return immediately
-        asyncio.create_task(run_background_process(command, mission_id))
+        # FIRE-AND-FORGET: Queue the process and return a job to poll
+        try:
+            job = jobs.submit(command, mission_id, data.get("callback_url"), priority, trace_id)
+        except asyncio.QueueFull:
+            return _saturated_response()
         return web.json_response({
             "status": "Task Started",
+            "job_id": job["job_id"],
             "command": command,
-            "info": "Execution running in background terminal."
+            "info": f"Execution running in background. Poll /jobs/{job['job_id']} for status."
         })
     
     # SYNC MODE: Wait and return result (Standard for quick recon)
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    
-    return web.json_response({
-        "mission_id": mission_id,
-        "stdout": stdout.decode(errors='ignore').strip(),
-        "stderr": stderr.decode(errors='ignore').strip(),
-        "exit_code": process.returncode
-    })
-
-async def run_background_process(command, mission_id):
-    """Handles long-running tools without blocking the Bridge."""
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    # In a full setup, you could trigger a webhook here or update a shared log file
-    print(f"[✔] Background Task Finished: {command[:30]}... (Mission: {mission_id})")
+    async def run():
+        process = await executor.spawn(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        output = {}
+
+        async def collect():
+            output["stdout"], output["stderr"] = await process.communicate()
+
+        with telemetry.stage("tool_runtime", trace_id, mission_id):
+            timed_out = await executor.run_with_timeout(process, collect(), timeout)
+        return {
+            "mission_id": mission_id,
+            "trace_id": trace_id,
+            "stdout": output.get("stdout", b"").decode(errors='ignore').strip(),
+            "stderr": output.get("stderr", b"").decode(errors='ignore').strip(),
+            "exit_code": process.returncode,
+            "timed_out": timed_out
+        }
+
+    try:
+        result = await executor.submit(run, priority)
+    except asyncio.QueueFull:
+        return _saturated_response()
+    return web.json_response(result)
+
+async def stream_tool(request):
+    """
+    Streaming exec: sends output as chunked NDJSON while the tool runs.
+    Lines are {"event": "output", "stream": ..., "data": ...} followed by one
+    {"event": "exit", ...} carrying the exit code and the output tail.
+    """
+    data = await request.json()
+    command = data.get("command")
+    mission_id = data.get("mission_id")
+
+    priority = data.get("priority", DEFAULT_PRIORITY)
+    timeout = data.get("timeout")
+    trace_id = _trace_id(request, data)
+
+    print(f"[*] [{datetime.datetime.now().strftime('%H:%M:%S')}] Mission {mission_id} -> {command} (stream, trace {trace_id})")
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    response.enable_chunked_encoding()
+
+    try:
+        await executor.submit(lambda: _stream_process(request, response, command, mission_id, timeout, trace_id),
+                              priority)
+    except asyncio.QueueFull:
+        return _saturated_response()
+    return response
+
+async def _stream_process(request, response, command, mission_id, timeout, trace_id=None):
+    """Runs inside an executor slot for stream_tool."""
+    await response.prepare(request)
+    process = await executor.spawn(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    tails = {"stdout": TailBuffer(), "stderr": TailBuffer()}
+    write_lock = asyncio.Lock()
+
+    async def send(event):
+        async with write_lock:
+            await response.write((json.dumps(event) + "\n").encode())
+
+    async def pump(name, reader):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        while True:
+            chunk = await reader.read(STREAM_READ_CHUNK)
+            if not chunk:
+                break
+            tails[name].write(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                await send({"event": "output", "stream": name, "data": text})
+
+    async def drain():
+        await asyncio.gather(pump("stdout", process.stdout), pump("stderr", process.stderr))
+        await process.wait()
+
+    try:
+        start = time.perf_counter()
+        with telemetry.stage("tool_runtime", trace_id, mission_id):
+            timed_out = await executor.run_with_timeout(process, drain(), timeout)
+        await send({
+            "event": "exit",
+            "mission_id": mission_id,
+            "trace_id": trace_id,
+            "runtime_ms": round((time.perf_counter() - start) * 1000, 1),
+            "exit_code": process.returncode,
+            "timed_out": timed_out,
+            "stdout_tail": tails["stdout"].getvalue().decode(errors='ignore').strip(),
+            "stderr_tail": tails["stderr"].getvalue().decode(errors='ignore').strip(),
+            "stdout_bytes": tails["stdout"].total,
+            "stderr_bytes": tails["stderr"].total
+        })
+        await response.write_eof()
+    finally:
+        if process.returncode is None:  # Client went away mid-run
+            kill_process_group(process.pid)
+            await process.wait()
+
+async def job_status(request):
+    job = jobs.jobs.get(request.match_info["job_id"])
+    if job is None:
+        return web.json_response({"error": "Unknown job"}, status=404)
+    return web.json_response(job)
+
+async def job_result(request):
+    """Paged output read: ?stream=stdout|stderr&offset=<bytes>&limit=<bytes>."""
+    job_id = request.match_info["job_id"]
+    if job_id not in jobs.jobs:
+        return web.json_response({"error": "Unknown job"}, status=404)
+    stream = request.query.get("stream", "stdout")
+    if stream not in ("stdout", "stderr"):
+        return web.json_response({"error": "stream must be stdout or stderr"}, status=400)
+    try:
+        offset = max(0, int(request.query.get("offset", 0)))
+        limit = min(JOB_PAGE_BYTES, max(1, int(request.query.get("limit", JOB_PAGE_BYTES))))
+    except ValueError:
+        return web.json_response({"error": "offset and limit must be integers"}, status=400)
+    page = jobs.read(job_id, stream, offset, limit)
+    page.update(job_id=job_id, stream=stream, status=jobs.jobs[job_id]["status"])
+    return web.json_response(page)
+
+async def start_workers(app):
+    global jobs
+    jobs = JobRegistry()
+    executor.start()
+    await jobs.resume()
+
+async def stop_workers(app):
+    await executor.stop()
 
 async def health_check(request):
-    return web.Response(text="DeepNightmare Bridge: ONLINE")
+    return web.json_response({"status": "ONLINE", "service": "DeepNightmare Bridge", "workers": executor.stats()})
 
 app = web.Application()
+app.on_startup.append(start_workers)
+app.on_cleanup.append(stop_workers)
 app.add_routes([
     web.post('/exec', execute_tool),
-    web.get('/status', health_check)
+    web.post('/exec/stream', stream_tool),
+    web.get('/jobs/{job_id}', job_status),
+    web.get('/jobs/{job_id}/result', job_result),
+    web.get('/status', health_check),
+    web.get('/metrics', telemetry.metrics_handler)
 ])
 
 if __name__ == '__main__':
@@ -0,0 +1,114 @@
+import json
+import os
+
+# Used when no manifest has ever loaded successfully
+FALLBACK_TOOLS = ["nmap", "sqlmap", "dirsearch", "wafw00f", "nikto", "curl"]
+RESERVED_SECTIONS = ("metadata",)
+
+class ManifestError(ValueError):
+    """Raised when a tool manifest does not match the expected schema."""
+
+class ManifestIndex:
+    """
+    Compiled view of tool_manifest.json / armory.json: a dict from approved
+    tool name to its manifest entries (phase, syntax template, output type).
+    refresh() re-reads the file only when its mtime changes.
+    """
+    def __init__(self, path="tool_manifest.json"):
+        self.path = path
+        self.tools = {}
+        self.metadata = {}
+        self._mtime = None
+        self.refresh()
+
+    @classmethod
+    def from_data(cls, data):
+        """Builds an index from an already parsed manifest dict."""
+        index = cls.__new__(cls)
+        index.path = None
+        index._mtime = None
+        index.metadata, index.tools = compile_manifest(data)
+        return index
+
+    def refresh(self):
+        """Reloads the manifest if it changed on disk. Returns self for chaining."""
+        if self.path is None:
+            return self
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            if not self.tools:
+                self.metadata, self.tools = compile_manifest({"approved_tools": FALLBACK_TOOLS})
+            return self
+        if mtime == self._mtime:
+            return self
+
+        try:
+            with open(self.path, 'r') as f:
+                self.metadata, self.tools = compile_manifest(json.load(f))
+            print(f"[*] Manifest loaded: {len(self.tools)} approved tools from {self.path}")
+        except (ValueError, OSError) as e:
+            print(f"[!] Manifest rejected ({self.path}): {e}. Keeping previous tool list.")
+            if not self.tools:
+                self.metadata, self.tools = compile_manifest({"approved_tools": FALLBACK_TOOLS})
+        self._mtime = mtime
+        return self
+
+    def __contains__(self, tool_name):
+        return tool_name in self.tools
+
+    def entries_for(self, tool_name):
+        return self.tools.get(tool_name, [])
+
+    def output_type(self, tool_name):
+        """The manifest's declared output_type for a tool, if any."""
+        for entry in self.entries_for(tool_name):
+            if entry.get("output_type"):
+                return entry["output_type"]
+        return None
+
+def compile_manifest(data):
+    """
+    Validates a manifest and returns (metadata, {tool: [entries]}).
+    Accepts the phase -> name -> {tool, syntax|command, ...} layout and the
+    legacy {"approved_tools": [...]} list.
+    """
+    if not isinstance(data, dict):
+        raise ManifestError("top level must be an object")
+
+    tools = {}
+    if "approved_tools" in data:
+        approved = data["approved_tools"]
+        if not isinstance(approved, list) or not all(isinstance(t, str) and t for t in approved):
+            raise ManifestError("approved_tools must be a list of tool names")
+        for tool in approved:
+            tools.setdefault(tool, []).append({"phase": None, "name": tool, "template": tool})
+        return {}, tools
+
+    metadata = {}
+    for phase, entries in data.items():
+        if phase in RESERVED_SECTIONS:
+            metadata[phase] = entries
+            continue
+        if not isinstance(entries, dict):
+            raise ManifestError(f"phase '{phase}' must be an object")
+        for name, info in entries.items():
+            where = f"{phase}.{name}"
+            if not isinstance(info, dict):
+                raise ManifestError(f"{where} must be an object")
+            tool = info.get("tool")
+            if not isinstance(tool, str) or not tool.strip() or len(tool.split()) != 1:
+                raise ManifestError(f"{where}.tool must be a single command name")
+            template = info.get("syntax", info.get("command"))
+            if not isinstance(template, str) or template.split()[:1] != [tool]:
+                raise ManifestError(f"{where} needs a 'syntax' or 'command' starting with '{tool}'")
+            tools.setdefault(tool, []).append({
+                "phase": phase,
+                "name": name,
+                "template": template,
+                "output_type": info.get("output_type"),
+                "description": info.get("description", "")
+            })
+    if not tools:
+        raise ManifestError("no tools defined")
+    return metadata, tools
@@ -0,0 +1,173 @@
+import time
+START = time.perf_counter()  # Taken before the heavier imports so the report includes them
+
+import argparse
+import asyncio
+import importlib
+import sys
+import transport
+from settings import get_settings
+from bridge_client import KaliBridgeClient
+
+READY_TIMEOUT = 30     # Seconds the bridge and Ollama each get to come up
+BACKOFF_INITIAL = 0.1  # First retry delay; doubles up to BACKOFF_MAX
+BACKOFF_MAX = 2.0
+PRELOAD_TIMEOUT = 300  # A cold model load reads the whole weights file
+
+def _ms(since):
+    return (time.perf_counter() - since) * 1000
+
+async def wait_ready(probe, timeout=READY_TIMEOUT):
+    """
+    Calls the async probe with exponential backoff until it returns something
+    truthy or timeout seconds pass. Returns (ok, attempts, result or last error).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = BACKOFF_INITIAL
+    attempts = 0
+    last_error = "not ready"
+    while True:
+        attempts += 1
+        try:
+            result = await probe()
+            if result:
+                return True, attempts, result
+        except Exception as e:
+            last_error = f"{type(e).__name__}: {e}"
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False, attempts, last_error
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, BACKOFF_MAX)
+
+# --- CHECKS ---
+# Each returns {"ok": bool, "ms": float, "attempts": int, "detail": str}
+
+async def check_bridge(timeout):
+    start = time.perf_counter()
+    client = KaliBridgeClient()
+    ok, attempts, detail = await wait_ready(client.check_connection, timeout)
+    return {"ok": ok, "ms": _ms(start), "attempts": attempts,
+            "detail": f"online at {client.base_url}" if ok else f"{client.base_url} unreachable ({detail})"}
+
+async def check_ollama(settings, timeout):
+    """Waits for Ollama, confirms the model is pulled, then loads it with keep_alive."""
+    start = time.perf_counter()
+    model = settings["brain.model"]
+    pool = transport.get_pool(transport.OLLAMA_BASE_URL, timeout=settings["network.brain_timeout"])
+
+    async def tags():
+        async with pool.get("/api/tags", timeout=5) as resp:
+            if resp.status != 200:
+                return None
+            data = await resp.json()
+            return [m.get("name") for m in data.get("models", [])] or ["(none)"]
+
+    ok, attempts, models = await wait_ready(tags, timeout)
+    if not ok:
+        return {"ok": False, "ms": _ms(start), "attempts": attempts,
+                "detail": f"{transport.OLLAMA_BASE_URL} unreachable ({models})"}
+    if model not in models and f"{model}:latest" not in models:
+        return {"ok": False, "ms": _ms(start), "attempts": attempts,
+                "detail": f"model {model} not pulled (run: ollama pull {model})"}
+
+    # No prompt: Ollama just loads the model. The options must match the
+    # apex's, or its first real request would trigger a reload.
+    payload = {"model": model, "keep_alive": settings["brain.keep_alive"], "stream": False,
+               "options": settings.ollama_options()}
+    load_start = time.perf_counter()
+    try:
+        async with pool.post("/api/generate", json=payload, timeout=PRELOAD_TIMEOUT) as resp:
+            data = await resp.json()
+        if data.get("error"):
+            raise RuntimeError(data["error"])
+    except Exception as e:
+        return {"ok": False, "ms": _ms(start), "attempts": attempts, "detail": f"preload of {model} failed: {e}"}
+    return {"ok": True, "ms": _ms(start), "attempts": attempts,
+            "detail": f"{model} loaded in {_ms(load_start):.0f} ms, keep_alive {settings['brain.keep_alive']}"}
+
+def _open_vault(path):
+    # Imported here so sqlite setup overlaps the network probes
+    from database_manager import MissionVault, SCHEMA_VERSION
+    with MissionVault(path) as vault:
+        version = vault.schema_version()
+        unindexed = [name for name, (uses_index, _) in vault.check_query_plans().items() if not uses_index]
+    if version != SCHEMA_VERSION:
+        raise RuntimeError(f"schema at version {version}, expected {SCHEMA_VERSION}")
+    detail = f"{path} at schema v{version}"
+    return detail + (f"; full scans in {', '.join(unindexed)}" if unindexed else "")
+
+async def check_vault(settings):
+    """Opens (and if needed migrates) the vault in a worker thread."""
+    start = time.perf_counter()
+    try:
+        detail = await asyncio.to_thread(_open_vault, settings["vault.path"])
+        return {"ok": True, "ms": _ms(start), "attempts": 1, "detail": detail}
+    except Exception as e:
+        return {"ok": False, "ms": _ms(start), "attempts": 1, "detail": f"{type(e).__name__}: {e}"}
+
+async def run_checks(settings, timeout):
+    checks = {
+        "bridge": check_bridge(timeout),
+        "ollama": check_ollama(settings, timeout),
+        "vault": check_vault(settings),
+    }
+    return dict(zip(checks, await asyncio.gather(*checks.values())))
+
+def print_report(results):
+    for name, result in results.items():
+        mark = "✔" if result["ok"] else "!"
+        print(f"[{mark}] {name:<6} {result['ms']:7.0f} ms  ({result['attempts']} attempt(s))  {result['detail']}")
+    print(f"[*] Preflight finished {_ms(START):.0f} ms after start")
+
+# --- LAUNCH ---
+
+async def launch(args, apex_import):
+    settings = get_settings()
+    results = await run_checks(settings, args.timeout)
+    print_report(results)
+    if not all(r["ok"] for r in results.values()):
+        await transport.close_all()
+        return 1
+    if not args.launch:
+        await transport.close_all()
+        return 0
+
+    ares_apex = await apex_import
+    target = args.target or (await asyncio.to_thread(input, "Enter target URL: ")).strip()
+    launched = time.perf_counter()
+    apex = ares_apex.DeepNightmareApex(target)
+    mission = asyncio.create_task(apex.run_mission())
+
+    async def report_first_command():
+        await apex.first_command.wait()
+        print(f"\n[+] Time to first command: {_ms(launched):.0f} ms after launch "
+              f"({_ms(START):.0f} ms after preflight start)")
+    reporter = asyncio.create_task(report_first_command())
+    try:
+        await mission
+    finally:
+        reporter.cancel()
+        apex.vault.close()  # Drain the write-behind queue before exit
+    return 0
+
+async def main(args):
+    # The apex (and everything it imports) loads in a thread while the probes run
+    apex_import = asyncio.ensure_future(asyncio.to_thread(importlib.import_module, "ares_apex")) if args.launch else None
+    try:
+        return await launch(args, apex_import)
+    finally:
+        if apex_import is not None and not apex_import.done():
+            apex_import.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Readiness checks for the bridge, Ollama and the vault; optionally starts the apex.")
+    parser.add_argument("--launch", action="store_true", help="Start the mission once every check passes")
+    parser.add_argument("--target", help="Target URL (asked interactively when omitted)")
+    parser.add_argument("--timeout", type=float, default=READY_TIMEOUT, help="Seconds to wait for each service")
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(main(args)))
+    except KeyboardInterrupt:
+        print("\n[!] Shutting down DeepNightmare...")
@@ -0,0 +1,217 @@
+import json
+import re
+import xml.etree.ElementTree as ET
+
+# Findings are plain dicts tagged with a "kind" the vault knows how to store:
+#   subdomain: hostname
+#   port:      host, port, protocol, service, product, version
+#   web:       url, status_code, title, webserver, tech, cdn
+#   path:      url, status_code, length
+#   waf:       waf
+#   hosting:   provider
+
+class LineParser:
+    """Base for incremental parsers: buffers partial lines between feed() calls."""
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text):
+        """Consumes a chunk of tool output and returns the findings it completed."""
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        findings = []
+        for line in lines:
+            findings.extend(self.parse_line(line.strip()))
+        return findings
+
+    def close(self):
+        """Flushes the last unterminated line once the tool has exited."""
+        line, self._pending = self._pending.strip(), ""
+        return list(self.parse_line(line)) if line else []
+
+    def parse_line(self, line):
+        return []
+
+class SubdomainListParser(LineParser):
+    """subfinder -silent: one hostname per line."""
+    HOSTNAME = re.compile(r"^[A-Za-z0-9_.-]+\.[A-Za-z]{2,}$")
+
+    def parse_line(self, line):
+        if self.HOSTNAME.match(line):
+            yield {"kind": "subdomain", "hostname": line.lower()}
+
+class HttpxParser(LineParser):
+    """httpx -json lines, falling back to the default '[200] [Title] [Tech]' text output."""
+    BRACKETS = re.compile(r"\[([^\]]*)\]")
+
+    def parse_line(self, line):
+        if not line:
+            return
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            yield {
+                "kind": "web",
+                "url": record.get("url") or record.get("input", ""),
+                "status_code": record.get("status_code") or record.get("status-code"),
+                "title": record.get("title"),
+                "webserver": record.get("webserver"),
+                "tech": ",".join(record.get("tech") or record.get("technologies") or []),
+                "cdn": record.get("cdn_name")
+            }
+            provider = record.get("cdn_name") or (record.get("asn") or {}).get("as_name")
+            if provider:
+                yield {"kind": "hosting", "provider": provider}
+            return
+
+        url, _, rest = line.partition(" ")
+        if not url.startswith("http"):
+            return
+        fields = self.BRACKETS.findall(rest)
+        status = next((int(f) for f in fields if f.isdigit()), None)
+        yield {"kind": "web", "url": url, "status_code": status, "title": None,
+               "webserver": None, "tech": ",".join(f for f in fields if not f.isdigit()), "cdn": None}
+
+class FfufParser(LineParser):
+    """ffuf -json lines, the single -of json document, or the default text lines."""
+    TEXT = re.compile(r"^(\S+)\s+\[Status: (\d+), Size: (\d+)")
+
+    def __init__(self):
+        super().__init__()
+        self._document = []  # -of json prints one document, possibly over many lines
+
+    def parse_line(self, line):
+        if not self._document and line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                self._document.append(line)  # Start of a pretty-printed document
+                return
+            for result in record.get("results", [record]):
+                yield self._path(result)
+            return
+        if self._document:
+            self._document.append(line)
+            return
+        match = self.TEXT.match(line)
+        if match:
+            yield {"kind": "path", "url": match.group(1), "status_code": int(match.group(2)),
+                   "length": int(match.group(3))}
+
+    def close(self):
+        findings = super().close()
+        if self._document:
+            try:
+                document = json.loads("\n".join(self._document))
+                findings.extend(self._path(r) for r in document.get("results", []))
+            except ValueError:
+                pass
+            self._document = []
+        return findings
+
+    @staticmethod
+    def _path(record):
+        return {"kind": "path", "url": record.get("url"), "status_code": record.get("status"),
+                "length": record.get("length")}
+
+class NmapParser:
+    """nmap -oX - XML through an incremental pull parser, else the normal text report."""
+    TEXT_HOST = re.compile(r"^Nmap scan report for (.+)$")
+    TEXT_PORT = re.compile(r"^(\d+)/(tcp|udp)\s+open\s+(\S+)\s*(.*)$")
+
+    def __init__(self):
+        self._mode = None
+        self._xml = None
+        self._host = None
+        self._text = LineParser()
+        self._text.parse_line = self._parse_text_line
+
+    def feed(self, text):
+        if self._mode is None:
+            head = text.lstrip()
+            if not head:
+                return []
+            self._mode = "xml" if head.startswith("<") else "text"
+            if self._mode == "xml":
+                self._xml = ET.XMLPullParser(events=("start", "end"))
+        if self._mode == "text":
+            return self._text.feed(text)
+        try:
+            self._xml.feed(text)
+        except ET.ParseError:
+            return []
+        return self._drain_xml()
+
+    def close(self):
+        if self._mode == "text":
+            return self._text.close()
+        if self._mode == "xml":
+            try:
+                self._xml.close()
+            except ET.ParseError:
+                pass
+            return self._drain_xml()
+        return []
+
+    def _drain_xml(self):
+        findings = []
+        for event, elem in self._xml.read_events():
+            if event == "start" and elem.tag == "host":
+                self._host = None
+            elif event == "end" and elem.tag == "address" and self._host is None:
+                self._host = elem.get("addr")
+            elif event == "end" and elem.tag == "hostname" and elem.get("type") == "user":
+                self._host = elem.get("name")
+            elif event == "end" and elem.tag == "port":
+                state = elem.find("state")
+                if state is not None and state.get("state") == "open":
+                    service = elem.find("service")
+                    service = service if service is not None else ET.Element("service")
+                    findings.append({
+                        "kind": "port", "host": self._host or "", "port": int(elem.get("portid")),
+                        "protocol": elem.get("protocol"), "service": service.get("name"),
+                        "product": service.get("product"), "version": service.get("version")
+                    })
+            elif event == "end" and elem.tag == "host":
+                elem.clear()  # Keeps memory flat on big sweeps
+        return findings
+
+    def _parse_text_line(self, line):
+        host = self.TEXT_HOST.match(line)
+        if host:
+            self._host = host.group(1)
+            return
+        port = self.TEXT_PORT.match(line)
+        if port:
+            service_info = port.group(4).split(None, 1)
+            yield {"kind": "port", "host": self._host or "", "port": int(port.group(1)),
+                   "protocol": port.group(2), "service": port.group(3),
+                   "product": service_info[0] if service_info else None,
+                   "version": service_info[1] if len(service_info) > 1 else None}
+
+class WafParser(LineParser):
+    """wafw00f verdict lines."""
+    BEHIND = re.compile(r"is behind (.+?) WAF")
+
+    def parse_line(self, line):
+        match = self.BEHIND.search(line)
+        if match:
+            yield {"kind": "waf", "waf": match.group(1).strip()}
+        elif "No WAF detected" in line:
+            yield {"kind": "waf", "waf": "None"}
+
+# output_type (as declared in the manifest) -> tool -> parser class
+PARSERS = {
+    "list": {"subfinder": SubdomainListParser},
+    "json": {"httpx": HttpxParser, "ffuf": FfufParser},
+    "text": {"nmap": NmapParser, "wafw00f": WafParser},
+}
+
+def get_parser(tool, output_type=None):
+    """Returns a fresh parser for a tool run, or None when nothing structured can be read."""
+    parser_cls = PARSERS.get(output_type or "", {}).get(tool)
+    if parser_cls is None:
+        parser_cls = next((by_tool[tool] for by_tool in PARSERS.values() if tool in by_tool), None)
+    return parser_cls() if parser_cls else None
@@ -0,0 +1,209 @@
+import os
+import collections
+
+CONFIG_PATH = os.environ.get("DEEPNIGHTMARE_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml"))
+ENV_PREFIX = "DEEPNIGHTMARE_"  # DEEPNIGHTMARE_HARDWARE_OPTIMIZATION_CPU_THREADS=8 overrides hardware_optimization.cpu_threads
+
+# hot=True: picked up by refresh() while running. Everything else needs a restart,
+# mostly because Ollama reloads the model when its load options change.
+Field = collections.namedtuple("Field", "type default minimum maximum hot")
+
+def _field(type, default, minimum=None, maximum=None, hot=False):
+    return Field(type, default, minimum, maximum, hot)
+
+FIELDS = {
+    "mission_profile.target_url": _field(str, ""),
+    "mission_profile.phase_gate_threshold": _field(int, 90, 0, 100, hot=True),
+    "mission_profile.log_level": _field(str, "VERBOSE", hot=True),
+    "mission_profile.auto_mode": _field(bool, False, hot=True),
+
+    "hardware_optimization.total_ram_gb": _field(int, 16, 1),
+    "hardware_optimization.cpu_threads": _field(int, 4, 1, 256),
+    "hardware_optimization.gpu_layers": _field(int, 0, 0),
+    "hardware_optimization.context_window": _field(int, 2048, 256),
+    "hardware_optimization.batch_size": _field(int, 512, 1),
+
+    "models.reasoner.path": _field(str, ""),
+    "models.reasoner.temp": _field(float, 0.6, 0.0, 2.0, hot=True),
+    "models.executor.path": _field(str, ""),
+    "models.executor.temp": _field(float, 0.1, 0.0, 2.0, hot=True),
+
+    "network.bridge_host": _field(str, "127.0.0.1"),
+    "network.bridge_port": _field(int, 9001, 1, 65535),
+    "network.request_timeout": _field(float, 600, 1),
+    "network.ollama_url": _field(str, "http://127.0.0.1:11434"),
+    "network.brain_timeout": _field(float, 60, 1),
+    "network.metrics_port": _field(int, 9101, 0, 65535),
+
+    "brain.model": _field(str, "qwen2.5-coder:0.5b"),
+    "brain.keep_alive": _field(str, "30m"),
+    "brain.strategy_token_budget": _field(int, 96, 1, hot=True),
+    "brain.command_token_budget": _field(int, 64, 1, hot=True),
+    "brain.context_token_budget": _field(int, 768, 64, hot=True),
+    "brain.cache_ttl": _field(float, 900, 0, hot=True),
+
+    "orchestrator.max_concurrent_tasks": _field(int, 2, 1, 64),
+    "orchestrator.idle_interval": _field(float, 15, 0.1, hot=True),
+    "orchestrator.saturation_backoff": _field(float, 5, 0, hot=True),
+    "orchestrator.record_spans": _field(bool, False),
+
+    "bridge.worker_slots": _field(int, 3, 1, 64),
+    "bridge.max_queue_depth": _field(int, 64, 1),
+    "bridge.tool_timeout": _field(float, 600, 1),
+    "bridge.rlimit_cpu_seconds": _field(int, 1800, 1),
+    "bridge.rlimit_as_gb": _field(float, 4, 0.25),
+    "bridge.jobs_dir": _field(str, "bridge_jobs"),
+
+    "vault.path": _field(str, "deepnightmare_vault.db"),
+    "vault.write_behind": _field(bool, True),
+    "vault.queue_size": _field(int, 10000, 1),
+    "vault.batch_size": _field(int, 256, 1),
+    "vault.flush_interval": _field(float, 0.5, 0.01),
+}
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+
+class ConfigError(ValueError):
+    """Raised when config.yaml or an override does not match FIELDS."""
+
+def _coerce(key, field, value):
+    if field.type is bool:
+        if isinstance(value, str) and value.strip().lower() in _TRUE + _FALSE:
+            value = value.strip().lower() in _TRUE
+        if not isinstance(value, bool):
+            raise ConfigError(f"{key} must be true or false, got {value!r}")
+    elif field.type in (int, float):
+        if isinstance(value, bool):
+            raise ConfigError(f"{key} must be a number, got {value!r}")
+        try:
+            value = field.type(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"{key} must be {'an integer' if field.type is int else 'a number'}, got {value!r}")
+        if field.minimum is not None and value < field.minimum:
+            raise ConfigError(f"{key} must be >= {field.minimum}, got {value}")
+        if field.maximum is not None and value > field.maximum:
+            raise ConfigError(f"{key} must be <= {field.maximum}, got {value}")
+    elif not isinstance(value, str):
+        value = str(value)
+    return value
+
+def _flatten(data, prefix=""):
+    for name, value in data.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{key}.")
+        else:
+            yield key, value
+
+def _env_name(key):
+    return ENV_PREFIX + key.replace(".", "_").upper()
+
+def parse_config(data, environ=None):
+    """
+    Validates a parsed config.yaml dict plus environment overrides and
+    returns a complete {dotted key: typed value} mapping.
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ConfigError("top level must be a mapping")
+    environ = os.environ if environ is None else environ
+
+    values = {key: field.default for key, field in FIELDS.items()}
+    for key, value in _flatten(data):
+        if key not in FIELDS:
+            print(f"[!] Unknown config key ignored: {key}")
+            continue
+        values[key] = _coerce(key, FIELDS[key], value)
+    for key, field in FIELDS.items():
+        override = environ.get(_env_name(key))
+        if override is not None:
+            values[key] = _coerce(_env_name(key), field, override)
+    return values
+
+class Settings:
+    """
+    Validated view of config.yaml with DEEPNIGHTMARE_* environment overrides.
+    refresh() re-reads the file when its mtime changes and applies only the
+    fields marked hot; other changes are reported and wait for a restart.
+    """
+    def __init__(self, path=CONFIG_PATH, environ=None):
+        self.path = path
+        self.environ = environ
+        self._mtime = None
+        self.values = parse_config(self._read(), environ)
+        self._mtime = self._stat()
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self):
+        try:
+            import yaml
+        except ImportError:
+            print("[!] PyYAML is not installed; using built-in defaults and environment overrides.")
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return yaml.safe_load(f)
+        except FileNotFoundError:
+            print(f"[!] {self.path} not found; using built-in defaults.")
+            return {}
+        except yaml.YAMLError as e:
+            raise ConfigError(f"{self.path}: {e}")
+
+    def get(self, key):
+        return self.values[key]
+
+    __getitem__ = get
+
+    def refresh(self):
+        """Reloads hot fields if the file changed. Returns {key: new value} of what was applied."""
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return {}
+        self._mtime = mtime
+        try:
+            fresh = parse_config(self._read(), self.environ)
+        except ConfigError as e:
+            print(f"[!] Config reload rejected: {e}. Keeping current settings.")
+            return {}
+
+        applied = {}
+        for key, value in fresh.items():
+            if value == self.values[key]:
+                continue
+            if FIELDS[key].hot:
+                self.values[key] = applied[key] = value
+            else:
+                print(f"[*] Config change to {key} takes effect on restart")
+        if applied:
+            print(f"[*] Config reloaded: {', '.join(f'{k}={v}' for k, v in applied.items())}")
+        return applied
+
+    def ollama_options(self, role="executor"):
+        """
+        /api/generate options for a model role ("reasoner" or "executor").
+        The load options are identical for every role so Ollama never has to
+        reload the model between strategy and command calls.
+        """
+        return {
+            "temperature": self.values[f"models.{role}.temp"],
+            "num_thread": self.values["hardware_optimization.cpu_threads"],
+            "num_ctx": self.values["hardware_optimization.context_window"],
+            "num_batch": self.values["hardware_optimization.batch_size"],
+            "num_gpu": self.values["hardware_optimization.gpu_layers"],
+        }
+
+_settings = None
+
+def get_settings():
+    """The process-wide Settings, loaded on first use."""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
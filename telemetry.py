@@ -0,0 +1,187 @@
+import time
+import uuid
+import threading
+import contextlib
+import contextvars
+
+# Stage latencies run from sub-millisecond (shield) to many minutes (tool runs)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+METRICS_CONTENT_TYPE = "text/plain"  # Prometheus text exposition format 0.0.4
+TRACE_HEADER = "X-Trace-Id"
+
+# Trace ID of the brain turn the running code belongs to; asyncio tasks
+# spawned during a turn inherit it.
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class CallbackMetric:
+    """
+    A counter or gauge read from existing state at scrape time. fn returns a
+    number, or a dict of label-value tuples to numbers when labelnames is set.
+    """
+    def __init__(self, name, help, kind, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = self.fn()
+        if not self.labelnames:
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def register_callback(self, name, help, fn, kind="gauge", labelnames=()):
+        """Adds (or replaces) a metric computed by fn on every scrape."""
+        self._metrics[name] = CallbackMetric(name, help, kind, fn, labelnames)
+        return self._metrics[name]
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Shared by the apex and the bridge; each process only fills the stages it runs
+STAGE_SECONDS = REGISTRY.histogram("deepnightmare_stage_seconds", "Wall-clock latency of each pipeline stage.", ("stage",))
+SHIELD_BLOCKS = REGISTRY.counter("deepnightmare_shield_blocks_total", "Generated commands rejected by the shield.")
+BRIDGE_ERRORS = REGISTRY.counter("deepnightmare_bridge_errors_total", "Failed or rejected bridge round trips.", ("kind",))
+
+# --- SPANS ---
+
+_span_sink = None
+
+def set_span_sink(sink):
+    """
+    Routes finished spans to sink(trace_id, stage, mission_id, started_at,
+    duration_ms, ok), e.g. MissionVault.record_span. None turns recording off.
+    """
+    global _span_sink
+    _span_sink = sink
+
+@contextlib.contextmanager
+def stage(name, trace_id=None, mission_id=None, span=True):
+    """
+    Times the enclosed block into STAGE_SECONDS and, when a span sink is set
+    and a trace is active, records it as a span of that trace. span=False
+    keeps the block out of the sink (the vault's own commits, for one).
+    """
+    trace_id = (trace_id or current_trace.get()) if span else None
+    started_at = time.time()
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        sink = _span_sink
+        if sink is not None and trace_id:
+            sink(trace_id, name, mission_id, started_at, elapsed * 1000, ok)
+
+# --- HTTP EXPOSITION ---
+
+async def metrics_handler(request):
+    from aiohttp import web
+    return web.Response(text=REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+async def start_metrics_server(host, port):
+    """Serves GET /metrics on its own AppRunner. Returns the runner; await runner.cleanup() to stop."""
+    from aiohttp import web
+    app = web.Application()
+    app.add_routes([web.get('/metrics', metrics_handler)])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
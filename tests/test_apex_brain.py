@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+import transport
+from ares_apex import DeepNightmareApex
+
+STRATEGY_CONTEXT = [7, 8, 9]
+
+@pytest.fixture
+def apex(tmp_path, monkeypatch):
+    monkeypatch.setattr(transport, "_POOLS", {})
+    apex = DeepNightmareApex("https://example.test", str(tmp_path / "vault.db"))
+    apex.mission_id = 1
+    apex.brain_context[1] = [1, 2, 3]
+    apex.payloads = []
+
+    async def fake_generate(payload, stream, stop):
+        apex.payloads.append(payload)
+        is_strategy = payload["prompt"].startswith("Provide a brief strategy.")
+        apex.last_generation = {"ttft_ms": 1.0, "total_ms": 1.0, "tokens": 3, "stopped_early": not is_strategy,
+                                "context": STRATEGY_CONTEXT if is_strategy else None}
+        return "Enumerate subdomains first." if is_strategy else "subfinder -d example.test"
+    apex._generate = fake_generate
+    yield apex
+    apex.vault.close()
+
+def test_command_step_continues_from_strategy_context(apex):
+    strategy, command, _ = asyncio.run(apex.plan_command("PHASE 1 (RECON)"))
+    assert (strategy, command) == ("Enumerate subdomains first.", "subfinder -d example.test")
+    strategy_payload, command_payload = apex.payloads
+    assert strategy_payload["context"] == [1, 2, 3]
+    # The strategy is already in the context; it must not be sent a second time
+    assert command_payload["context"] == STRATEGY_CONTEXT
+    assert command_payload["prompt"] == "Output ONLY the bash command."
+    assert "Enumerate subdomains" not in command_payload["prompt"]
+
+def test_cached_strategy_falls_back_to_the_strategy_prompt(apex):
+    asyncio.run(apex.plan_command("PHASE 1 (RECON)"))
+    apex.cache.invalidate(apex.last_generation["cache_key"])  # Only the strategy stays cached
+    apex.payloads.clear()
+    asyncio.run(apex.plan_command("PHASE 1 (RECON)"))
+    [command_payload] = apex.payloads
+    assert command_payload["context"] == [1, 2, 3]
+    assert command_payload["prompt"].endswith("Context: Strategy: Enumerate subdomains first.")
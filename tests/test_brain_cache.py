@@ -0,0 +1,66 @@
+import pytest
+import brain_cache
+from brain_cache import BrainCache
+from database_manager import MissionVault
+
+@pytest.fixture
+def vault(tmp_path):
+    with MissionVault(str(tmp_path / "vault.db")) as vault:
+        yield vault
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(brain_cache.time, "time", lambda: now[0])
+    return now
+
+def key(n):
+    return BrainCache.make_key("qwen", f"prompt {n}", "instruction", {"temperature": 0.1})
+
+def vault_keys(vault):
+    return {row[0] for row in vault.conn.execute("SELECT key FROM brain_cache")}
+
+def test_entries_expire_after_ttl(vault, clock, monkeypatch):
+    monkeypatch.setattr("database_manager.time.time", lambda: clock[0])
+    cache = BrainCache(vault, ttl=60)
+    cache.put(key(1), "nmap -sV example.test")
+    clock[0] += 59
+    assert cache.get(key(1)) == "nmap -sV example.test"
+    clock[0] += 2
+    assert cache.get(key(1)) is None
+    # A fresh cache in front of the same vault must not revive it either
+    assert BrainCache(vault, ttl=60).get(key(1)) is None
+
+def test_byte_budgets_evict_least_recently_used(vault, clock, monkeypatch):
+    monkeypatch.setattr("database_manager.time.time", lambda: clock[0])
+    cache = BrainCache(vault, max_memory_bytes=25, max_vault_bytes=25)
+    for n in range(3):
+        cache.put(key(n), "x" * 10)
+        clock[0] += 1
+    cache.get(key(1))  # Most recently used in memory now
+    cache.put(key(3), "y" * 10)
+    stats = cache.stats()
+    assert stats["memory_bytes"] <= 25
+    assert list(cache._memory) == [key(1), key(3)]
+    assert vault_keys(vault) == {key(2), key(3)}
+
+def test_bypass_skips_lookup_but_counts(vault):
+    cache = BrainCache(vault)
+    cache.put(key(1), "subfinder -d example.test")
+    assert cache.get(key(1), bypass=True) is None
+    assert cache.get(key(1)) == "subfinder -d example.test"
+    assert cache.counters["bypassed"] == 1
+    assert cache.counters["memory_hits"] == 1
+
+def test_invalidated_answers_are_asked_again(tmp_path):
+    with MissionVault(str(tmp_path / "wb.db"), write_behind=True, flush_interval=0.05) as vault:
+        cache = BrainCache(vault)
+        cache.put(key(1), "rm -rf /")
+        vault.flush()
+        cache.invalidate(key(1), None)
+        # Not yet deleted from the vault by the writer thread, still a miss
+        assert cache.get(key(1)) is None
+        vault.flush()
+        assert key(1) not in vault_keys(vault)
+        cache.put(key(1), "nmap example.test")
+        assert cache.get(key(1)) == "nmap example.test"
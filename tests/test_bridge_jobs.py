@@ -0,0 +1,187 @@
+import asyncio
+import importlib
+import os
+import sys
+import pytest
+
+@pytest.fixture
+def bridge():
+    return importlib.import_module("kali_bridge_server")
+
+def test_import_creates_no_job_spool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "kali_bridge_server", raising=False)
+    bridge = importlib.import_module("kali_bridge_server")
+    assert bridge.jobs is None
+    assert os.listdir(tmp_path) == []
+    assert os.path.dirname(bridge.JOBS_DIR) == os.path.dirname(os.path.abspath(bridge.__file__))
+
+def test_queued_job_is_not_eof(bridge, tmp_path):
+    registry = bridge.JobRegistry(str(tmp_path / "jobs"))
+    meta = {"job_id": "q1", "mission_id": 1, "command": "nmap x", "status": "queued"}
+    registry.jobs["q1"] = meta
+    assert registry.read("q1", "stdout", 0, 1024)["eof"] is False
+    meta["status"] = "running"
+    assert registry.read("q1", "stdout", 0, 1024)["eof"] is False
+    for status in bridge.JOB_TERMINAL_STATES:
+        meta["status"] = status
+        assert registry.read("q1", "stdout", 0, 1024)["eof"] is True
+
+def test_crashed_run_marks_job_failed(bridge, tmp_path, monkeypatch):
+    async def scenario():
+        executor = bridge.BridgeExecutor(slots=1)
+        monkeypatch.setattr(bridge, "executor", executor)
+
+        async def broken_spawn(command, **kwargs):
+            raise OSError("fork failed")
+        monkeypatch.setattr(executor, "spawn", broken_spawn)
+        executor.start()
+        try:
+            registry = bridge.JobRegistry(str(tmp_path / "jobs"))
+            meta = registry.submit("nmap example.test", mission_id=1)
+            for _ in range(100):
+                if meta["status"] != "queued":
+                    break
+                await asyncio.sleep(0.01)
+            return meta
+        finally:
+            await executor.stop()
+
+    meta = asyncio.run(scenario())
+    assert meta["status"] == "failed"
+    assert "fork failed" in meta["error"]
+
+def test_paged_reads_keep_multibyte_characters(bridge, tmp_path):
+    registry = bridge.JobRegistry(str(tmp_path / "jobs"))
+    text = "résumé – 東京 🔥 naïve\n" * 20
+    os.makedirs(registry._path("u1", ""))
+    with open(registry._path("u1", "stdout.log"), "wb") as f:
+        f.write(text.encode())
+    registry.jobs["u1"] = {"job_id": "u1", "status": "finished"}
+    for limit in range(1, 12):
+        pages, offset = [], 0
+        while True:
+            page = registry.read("u1", "stdout", offset, limit)
+            pages.append(page["data"])
+            offset = page["next_offset"]
+            if page["eof"]:
+                break
+        if limit >= 4:  # Below that a single character cannot fit in one page
+            assert "".join(pages) == text
+
+def test_job_wrapper_survives_trailing_comment(bridge, tmp_path, monkeypatch):
+    async def scenario():
+        executor = bridge.BridgeExecutor(slots=1, timeout=10)
+        monkeypatch.setattr(bridge, "executor", executor)
+        executor.start()
+        try:
+            registry = bridge.JobRegistry(str(tmp_path / "jobs"))
+            meta = registry.submit("echo hello # trailing note", mission_id=1)
+            for _ in range(500):
+                if meta["status"] in bridge.JOB_TERMINAL_STATES:
+                    break
+                await asyncio.sleep(0.01)
+            return registry, meta
+        finally:
+            await executor.stop()
+
+    registry, meta = asyncio.run(scenario())
+    assert meta["status"] == "finished"
+    assert registry.read(meta["job_id"], "stdout", 0, 1024)["data"] == "hello\n"
+
+# --- STREAMING EXEC ---
+
+def stream_scenario(bridge, monkeypatch, body, slots=1, max_queue=4, timeout=10):
+    """Serves /exec/stream from a fresh executor and runs body(client, executor) against it."""
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    import transport
+    from bridge_client import KaliBridgeClient
+    monkeypatch.setattr(transport, "_POOLS", {})
+
+    async def scenario():
+        executor = bridge.BridgeExecutor(slots=slots, max_queue=max_queue, timeout=timeout)
+        monkeypatch.setattr(bridge, "executor", executor)
+        executor.start()
+        app = web.Application()
+        app.add_routes([web.post('/exec/stream', bridge.stream_tool)])
+        server = TestServer(app, host="127.0.0.1")
+        await server.start_server()
+        client = KaliBridgeClient("127.0.0.1", server.port, timeout=timeout)
+        try:
+            return await body(client, executor)
+        finally:
+            await client.close()
+            await server.close()
+            await executor.stop()
+    return asyncio.run(scenario())
+
+def test_stream_sends_output_while_the_tool_runs(bridge, monkeypatch):
+    async def body(client, executor):
+        loop = asyncio.get_running_loop()
+        events = []
+        async for event in client.stream_command(1, "echo first; sleep 0.4; echo second", trace_id="t1"):
+            events.append((loop.time(), event))
+        return events
+    events = stream_scenario(bridge, monkeypatch, body)
+    outputs = [(t, e) for t, e in events if e["event"] == "output"]
+    (exit_time, exit_event), = [(t, e) for t, e in events if e["event"] == "exit"]
+    assert "".join(e["data"] for _, e in outputs) == "first\nsecond\n"
+    assert exit_time - outputs[0][0] >= 0.3  # 'first' arrived before the tool finished
+    assert exit_event["exit_code"] == 0 and exit_event["trace_id"] == "t1"
+
+def test_exit_event_carries_a_capped_tail(bridge, monkeypatch):
+    size = bridge.STREAM_TAIL_BYTES * 3
+
+    async def body(client, executor):
+        return [e async for e in client.stream_command(1, f"{sys.executable} -c \"import sys; sys.stdout.write('x' * {size})\"; echo oops >&2; exit 3")]
+    events = stream_scenario(bridge, monkeypatch, body)
+    exit_event = events[-1]
+    assert exit_event["event"] == "exit"
+    assert exit_event["exit_code"] == 3
+    assert exit_event["stdout_bytes"] == size
+    assert exit_event["stdout_tail"] == "x" * bridge.STREAM_TAIL_BYTES
+    assert exit_event["stderr_tail"] == "oops"
+    assert sum(len(e["data"]) for e in events if e.get("stream") == "stdout") == size
+
+def _group_alive(pgid):
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+
+def test_client_disconnect_kills_the_process_group(bridge, monkeypatch):
+    async def body(client, executor):
+        stream = client.stream_command(1, "echo $$; while true; do echo tick; sleep 0.05; done")
+        first = await stream.__anext__()
+        pgid = int(first["data"].split()[0])
+        assert _group_alive(pgid)
+        await stream.aclose()  # Hangs up mid-run
+        for _ in range(100):
+            if not _group_alive(pgid) and executor.busy == 0:
+                break
+            await asyncio.sleep(0.05)
+        return pgid, executor.busy
+    pgid, busy = stream_scenario(bridge, monkeypatch, body)
+    assert not _group_alive(pgid)
+    assert busy == 0
+
+def test_saturated_bridge_answers_503_with_retry_after(bridge, monkeypatch):
+    async def until(ready):
+        while not ready():
+            await asyncio.sleep(0.01)
+
+    async def body(client, executor):
+        async def hold():
+            return [e async for e in client.stream_command(1, "sleep 0.5")]
+        running = [asyncio.create_task(hold())]
+        await until(lambda: executor.busy == 1)  # The only slot is taken...
+        running.append(asyncio.create_task(hold()))
+        await until(lambda: executor._queue.full())  # ...and the queue is full
+        refused = [e async for e in client.stream_command(1, "echo never")]
+        await asyncio.gather(*running)
+        return refused
+    refused = stream_scenario(bridge, monkeypatch, body, slots=1, max_queue=1)
+    assert refused == [{"event": "exit", "exit_code": None, "stdout_tail": "",
+                        "stderr_tail": "Bridge Error: 503", "http_status": 503, "retry_after": "5"}]
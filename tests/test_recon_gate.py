@@ -0,0 +1,70 @@
+import json
+import os
+from database_manager import MissionVault, RECON_WEIGHTS
+from manifest_index import ManifestIndex
+from neural_shield import NeuralShield
+from result_parsers import get_parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET = "example.test"
+GATE = 90
+
+# What each recon tool prints when run with the shipped manifest template
+SAMPLE_OUTPUT = {
+    "subfinder": "www.example.test\napi.example.test\n",
+    "httpx": json.dumps({"url": "https://example.test", "status_code": 200, "title": "Example",
+                         "webserver": "nginx", "tech": ["Nginx"], "cdn_name": "cloudflare",
+                         "asn": {"as_name": "CLOUDFLARENET"}}) + "\n",
+    "nmap": "Nmap scan report for example.test (192.0.2.10)\n"
+            "PORT    STATE SERVICE VERSION\n"
+            "80/tcp  open  http    nginx 1.18.0\n"
+            "443/tcp open  https   nginx 1.18.0\n",
+    "wafw00f": "[+] The site https://example.test is behind Cloudflare (Cloudflare Inc.) WAF.\n",
+}
+
+def recon_commands(manifest_path):
+    index = ManifestIndex(os.path.join(ROOT, manifest_path))
+    return index, [entry["template"].format(target=TARGET)
+                   for entries in index.tools.values() for entry in entries
+                   if "recon" in entry["phase"]]
+
+def test_shipped_recon_tools_reach_the_gate(tmp_path):
+    index, commands = recon_commands("tool_manifest.json")
+    shield = NeuralShield()
+    with MissionVault(str(tmp_path / "vault.db")) as vault:
+        with vault.conn:
+            vault.conn.execute("INSERT INTO missions (target_url) VALUES (?)", (TARGET,))
+        for command in commands:
+            is_safe, command = shield.validate_command(command, index)
+            assert is_safe, command
+            tool = command.split()[0]
+            parser = get_parser(tool, index.output_type(tool))
+            assert parser is not None, tool
+            vault.record_findings(1, parser.feed(SAMPLE_OUTPUT[tool]) + parser.close())
+        stats = vault.get_recon_stats(TARGET)
+    assert stats["recon_pct"] >= GATE
+    assert stats["current_phase"] == 2
+    assert sum(RECON_WEIGHTS.values()) >= GATE
+
+def test_httpx_templates_request_json():
+    for path in ("tool_manifest.json", "armory.json"):
+        index = ManifestIndex(os.path.join(ROOT, path))
+        for entry in index.entries_for("httpx"):
+            assert entry["output_type"] == "json"
+            assert "-json" in entry["template"].split(), path
+
+def test_configured_gate_threshold_is_honoured(tmp_path):
+    with MissionVault(str(tmp_path / "vault.db")) as vault:
+        with vault.conn:
+            vault.conn.execute("INSERT INTO missions (target_url) VALUES (?)", (TARGET,))
+        findings = [{"kind": "subdomain", "hostname": "www.example.test"}, {"kind": "waf", "waf": "None"}]
+        vault.record_findings(1, findings, gate_threshold=40)
+        assert dict(vault.get_recon_stats(TARGET))["current_phase"] == 2
+
+        with vault.conn:
+            vault.conn.execute("INSERT INTO missions (target_url) VALUES ('strict.test')")
+        vault.record_findings(2, findings + [{"kind": "hosting", "provider": "AWS"}], gate_threshold=100)
+        assert dict(vault.get_recon_stats("strict.test"))["current_phase"] == 1
+
+        assert vault.update_recon_progress("strict.test", "None", "AWS", 60, gate_threshold=60) is True
+        assert vault.update_recon_progress("strict.test", "None", "AWS", 60) is False
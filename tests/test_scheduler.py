@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+import transport
+from ares_apex import MissionScheduler, DeepNightmareApex, FAILURE_BACKOFF_MAX
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_slots_bound_concurrency():
+    async def scenario():
+        scheduler = MissionScheduler(max_concurrency=2, idle_interval=1, saturation_backoff=0.01)
+        release = asyncio.Event()
+
+        async def tool():
+            await release.wait()
+            return True
+
+        for _ in range(2):
+            await scheduler.acquire_slot()
+            scheduler.spawn(tool())
+        assert scheduler.in_flight == 2
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire_slot(), 0.05)
+        release.set()
+        await asyncio.wait_for(scheduler.acquire_slot(), 1)
+        await asyncio.sleep(0)
+        assert scheduler.in_flight == 0
+    run(scenario())
+
+def test_only_successful_tasks_wake_the_brain():
+    async def scenario():
+        scheduler = MissionScheduler(max_concurrency=1, idle_interval=0.2, saturation_backoff=0.01)
+        loop = asyncio.get_running_loop()
+
+        async def outcome(result):
+            return result
+
+        timings = []
+        for result in (True, False):
+            await scheduler.acquire_slot()
+            scheduler.spawn(outcome(result))
+            start = loop.time()
+            await scheduler.wait_for_wakeup()
+            timings.append(loop.time() - start)
+        return timings
+    woken, idled = run(scenario())
+    assert woken < 0.1
+    assert idled >= 0.19
+
+def test_consecutive_failures_back_off_exponentially():
+    async def scenario():
+        scheduler = MissionScheduler(max_concurrency=1, idle_interval=1, saturation_backoff=0.05)
+        loop = asyncio.get_running_loop()
+        delays = [scheduler.record_failure() for _ in range(3)]
+        start = loop.time()
+        await scheduler.acquire_slot()
+        waited = loop.time() - start
+        scheduler.release_slot()
+
+        scheduler.failures = 30
+        capped = scheduler.record_failure()
+        scheduler.record_success()
+        return delays, waited, capped, scheduler.failures
+    delays, waited, capped, failures = run(scenario())
+    assert delays == [0.05, 0.1, 0.2]
+    assert waited >= 0.19
+    assert capped == FAILURE_BACKOFF_MAX
+    assert failures == 0
+
+class DeadBridge:
+    async def stream_command(self, mission_id, command, trace_id=None):
+        raise ConnectionRefusedError("bridge is down")
+        yield
+
+def test_unreachable_bridge_backs_off_and_does_not_wake(tmp_path, monkeypatch):
+    monkeypatch.setattr(transport, "_POOLS", {})
+
+    async def scenario():
+        apex = DeepNightmareApex("https://example.test", str(tmp_path / "vault.db"))
+        apex.scheduler = MissionScheduler(max_concurrency=1, idle_interval=0.1, saturation_backoff=0.05)
+        apex.bridge_client = DeadBridge()
+        try:
+            await apex.initialize_mission()
+            apex.cache.put("command-key", "nmap example.test")
+            for _ in range(3):
+                await apex.scheduler.acquire_slot()
+                await apex.scheduler.spawn(apex.execute_task("nmap example.test", "scan", cache_keys=("command-key",)))
+            assert apex.cache.get("command-key") is None  # The failed answer is asked for again
+            return apex.scheduler.failures, apex.scheduler._wakeup.is_set()
+        finally:
+            await transport.close_all()
+            apex.vault.close()
+    failures, woken = run(scenario())
+    assert failures == 3
+    assert not woken
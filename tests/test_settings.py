@@ -0,0 +1,87 @@
+import asyncio
+import os
+import pytest
+import transport
+from settings import ConfigError, FIELDS, Settings, parse_config
+
+def test_defaults_fill_missing_keys():
+    values = parse_config({}, environ={})
+    assert values == {key: field.default for key, field in FIELDS.items()}
+
+def test_values_are_coerced_to_their_field_type():
+    values = parse_config({"network": {"bridge_port": "9002", "brain_timeout": 30},
+                           "orchestrator": {"record_spans": "yes"}}, environ={})
+    assert values["network.bridge_port"] == 9002
+    assert values["network.brain_timeout"] == 30.0 and isinstance(values["network.brain_timeout"], float)
+    assert values["orchestrator.record_spans"] is True
+
+@pytest.mark.parametrize("data, message", [
+    ({"network": {"bridge_port": "nine"}}, "network.bridge_port must be an integer"),
+    ({"network": {"bridge_port": 70000}}, "must be <= 65535"),
+    ({"hardware_optimization": {"cpu_threads": 0}}, "must be >= 1"),
+    ({"mission_profile": {"phase_gate_threshold": True}}, "must be a number"),
+    ({"orchestrator": {"record_spans": "maybe"}}, "must be true or false"),
+    (["not", "a", "mapping"], "top level must be a mapping"),
+])
+def test_invalid_values_are_rejected(data, message):
+    with pytest.raises(ConfigError, match=message):
+        parse_config(data, environ={})
+
+def test_unknown_keys_are_ignored(capsys):
+    values = parse_config({"brain": {"modle": "typo"}}, environ={})
+    assert "brain.modle" not in values
+    assert "Unknown config key ignored: brain.modle" in capsys.readouterr().out
+
+def test_environment_overrides_file_values():
+    environ = {"DEEPNIGHTMARE_HARDWARE_OPTIMIZATION_CPU_THREADS": "8",
+               "DEEPNIGHTMARE_BRAIN_MODEL": "qwen2.5-coder:1.5b"}
+    values = parse_config({"hardware_optimization": {"cpu_threads": 2}}, environ=environ)
+    assert values["hardware_optimization.cpu_threads"] == 8
+    assert values["brain.model"] == "qwen2.5-coder:1.5b"
+    with pytest.raises(ConfigError, match="DEEPNIGHTMARE_NETWORK_BRIDGE_PORT"):
+        parse_config({}, environ={"DEEPNIGHTMARE_NETWORK_BRIDGE_PORT": "0"})
+
+def write_config(path, gate, threads):
+    path.write_text(f"mission_profile:\n  phase_gate_threshold: {gate}\n"
+                    f"hardware_optimization:\n  cpu_threads: {threads}\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))  # Coarse mtimes would hide the edit
+
+def test_refresh_applies_only_hot_fields(tmp_path, capsys):
+    path = tmp_path / "config.yaml"
+    write_config(path, 90, 4)
+    settings = Settings(str(path), environ={})
+    assert settings.refresh() == {}
+
+    write_config(path, 70, 8)
+    assert settings.refresh() == {"mission_profile.phase_gate_threshold": 70}
+    assert settings["hardware_optimization.cpu_threads"] == 4
+    assert "hardware_optimization.cpu_threads takes effect on restart" in capsys.readouterr().out
+
+    path.write_text("mission_profile:\n  phase_gate_threshold: 500\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000))
+    assert settings.refresh() == {}
+    assert settings["mission_profile.phase_gate_threshold"] == 70
+
+def test_apex_takes_every_brain_setting_from_injected_config(tmp_path, monkeypatch):
+    from ares_apex import DeepNightmareApex
+    monkeypatch.setattr(transport, "_POOLS", {})
+    environ = {"DEEPNIGHTMARE_BRAIN_MODEL": "injected-model", "DEEPNIGHTMARE_BRAIN_KEEP_ALIVE": "5m",
+               "DEEPNIGHTMARE_NETWORK_BRAIN_TIMEOUT": "12", "DEEPNIGHTMARE_NETWORK_OLLAMA_URL": "http://127.0.0.1:1",
+               "DEEPNIGHTMARE_NETWORK_BRIDGE_PORT": "9555"}
+    settings = Settings(str(tmp_path / "missing.yaml"), environ=environ)
+    apex = DeepNightmareApex("https://example.test", str(tmp_path / "vault.db"), settings=settings)
+    try:
+        payloads = []
+
+        async def fake_generate(payload, stream, stop):
+            payloads.append(payload)
+            return "nmap example.test"
+        apex._generate = fake_generate
+        asyncio.run(apex.ask_qwen("goal", "Output ONLY the bash command."))
+        assert payloads[0]["model"] == "injected-model"
+        assert payloads[0]["keep_alive"] == "5m"
+        assert apex.ollama.base_url == "http://127.0.0.1:1" and apex.ollama.timeout == 12
+        assert apex.bridge_client.base_url.endswith(":9555")
+    finally:
+        apex.vault.close()
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+import transport
+from bridge_client import KaliBridgeClient
+
+@pytest.fixture(autouse=True)
+def fresh_pools(monkeypatch):
+    monkeypatch.setattr(transport, "_POOLS", {})
+
+def test_conflicting_pool_options_are_reported(capsys):
+    pool = transport.get_pool("http://127.0.0.1:9001/", timeout=600)
+    assert transport.get_pool("http://127.0.0.1:9001", timeout=600) is pool
+    assert capsys.readouterr().out == ""
+    assert transport.get_pool("http://127.0.0.1:9001", timeout=5, limit=2) is pool
+    out = capsys.readouterr().out
+    assert "timeout=5" in out and "limit=2" in out
+    assert pool.timeout == 600
+
+def test_client_leaves_a_shared_pool_open():
+    async def scenario():
+        shared = transport.get_pool("http://127.0.0.1:9001", timeout=600)
+        session = shared.session()
+        client = KaliBridgeClient("127.0.0.1", 9001)
+        assert client.pool is shared
+        await client.close()
+        still_open = not session.closed
+        await transport.close_all()
+        return still_open
+    assert asyncio.run(scenario())
+
+def test_client_closes_the_pool_it_created():
+    async def scenario():
+        client = KaliBridgeClient("127.0.0.1", 9001)
+        session = client.pool.session()
+        await client.close()
+        return session.closed
+    assert asyncio.run(scenario())
+
+def test_apex_bridge_client_owns_its_pool(tmp_path):
+    from ares_apex import DeepNightmareApex
+    apex = DeepNightmareApex("https://example.test", str(tmp_path / "vault.db"))
+    try:
+        assert apex.bridge_client.pool.owner is apex.bridge_client
+    finally:
+        apex.vault.close()
@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import pytest
+import database_manager
+from database_manager import MissionVault, HOT_QUERIES, SCHEMA_VERSION
+
+# The vault layout before schema_version existed, as the original MissionVault created it
+BASELINE_SCHEMA = [
+    '''CREATE TABLE missions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        target_url TEXT UNIQUE,
+        current_phase INTEGER DEFAULT 1,
+        recon_pct INTEGER DEFAULT 0,
+        waf_type TEXT,
+        hosting_provider TEXT,
+        start_date TIMESTAMP,
+        last_update TIMESTAMP
+    )''',
+    '''CREATE TABLE intel_payloads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mission_id INTEGER,
+        category TEXT,
+        data_json TEXT,
+        integrity_hash TEXT,
+        FOREIGN KEY(mission_id) REFERENCES missions(id)
+    )''',
+    '''CREATE TABLE terminal_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mission_id INTEGER,
+        brain_source TEXT,
+        command_executed TEXT,
+        raw_output TEXT,
+        status TEXT,
+        timestamp TIMESTAMP
+    )''',
+]
+
+def make_baseline_vault(path, log_rows=3):
+    conn = sqlite3.connect(path)
+    with conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT INTO missions (target_url, start_date) VALUES ('https://example.test', '2026-01-01')")
+        conn.execute("INSERT INTO intel_payloads (mission_id, category, data_json, integrity_hash) VALUES (1, 'dns', ?, '')",
+                     (json.dumps({"mx": "mail.example.test"}),))
+        conn.executemany(
+            "INSERT INTO terminal_logs (mission_id, brain_source, command_executed, raw_output, status, timestamp) "
+            "VALUES (1, 'Executor', ?, ?, 'Success', '2026-01-01')",
+            [(f"nmap -p {i} example.test", f"{i}/tcp open http\n" * (i % 7 + 1)) for i in range(log_rows)])
+    conn.close()
+
+@pytest.fixture
+def baseline_path(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    make_baseline_vault(path)
+    return path
+
+def test_baseline_vault_migrates_in_place(baseline_path):
+    with MissionVault(baseline_path) as vault:
+        assert vault.schema_version() == SCHEMA_VERSION
+        assert vault.get_intel(1, "dns", verify=True) == {"mx": "mail.example.test"}
+        assert vault.get_output(2) == "1/tcp open http\n" * 2
+        assert vault.conn.execute("SELECT COUNT(*) FROM terminal_logs WHERE raw_output IS NOT NULL").fetchone()[0] == 0
+
+def test_hot_queries_use_indexes_after_migration(baseline_path):
+    with MissionVault(baseline_path) as vault:
+        report = vault.check_query_plans()
+    assert set(report) == set(HOT_QUERIES)
+    for name, (uses_index, detail) in report.items():
+        assert uses_index, f"{name}: {detail}"
+
+def test_reopening_a_migrated_vault_is_a_no_op(baseline_path):
+    MissionVault(baseline_path).close()
+    with MissionVault(baseline_path) as vault:
+        applied = vault.conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+    assert applied == SCHEMA_VERSION
+
+def test_output_migration_walks_logs_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_manager, "MIGRATION_BATCH_ROWS", 4)
+    path = str(tmp_path / "many.db")
+    make_baseline_vault(path, log_rows=23)
+    with MissionVault(path) as vault:
+        for log_id in range(1, 24):
+            assert vault.get_output(log_id) == f"{log_id - 1}/tcp open http\n" * ((log_id - 1) % 7 + 1)
+        assert vault.conn.execute("SELECT COUNT(*) FROM terminal_logs WHERE output_hash IS NULL").fetchone()[0] == 0
@@ -0,0 +1,34 @@
+import threading
+import pytest
+from database_manager import MissionVault
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = MissionVault(str(tmp_path / "vault.db"), write_behind=True, flush_interval=0.05)
+    with vault.conn:
+        vault.conn.execute("INSERT INTO missions (target_url) VALUES ('https://example.test')")
+    yield vault
+    vault.close()
+
+def test_bad_op_does_not_kill_writer(vault):
+    vault.record_findings(1, [{"kind": "waf"}])  # KeyError inside the writer
+    vault.flush()
+    assert vault._writer.is_alive()
+    vault.log_terminal_action(1, "Executor", "subfinder -d example.test", "a.example.test", "Success")
+    vault.flush()
+    assert vault.get_logs_since(1, 0)[0]["command_executed"] == "subfinder -d example.test"
+
+def test_flush_and_close_return_when_writer_is_dead(vault, monkeypatch):
+    def die(conn, ops):
+        raise SystemExit  # Escapes the per-op handling and ends the thread
+    monkeypatch.setattr(vault, "_commit_batch", die)
+    monkeypatch.setattr(threading, "excepthook", lambda args: None)
+    vault.log_terminal_action(1, "Executor", "ffuf", "", "Success")
+    vault._writer.join(timeout=5)
+    assert not vault._writer.is_alive()
+
+    # Later writes fall back to inline commits instead of piling up in the queue
+    vault.log_terminal_action(1, "Executor", "httpx", "", "Success")
+    done = threading.Event()
+    threading.Thread(target=lambda: (vault.flush(), vault.close(), done.set()), daemon=True).start()
+    assert done.wait(5)
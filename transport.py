@@ -0,0 +1,143 @@
+import asyncio
+import time
+import aiohttp
+from settings import get_settings
+
+# --- CONFIGURATION ---
+_settings = get_settings()
+OLLAMA_BASE_URL = _settings["network.ollama_url"]
+KALI_BRIDGE_BASE_URL = f"http://{_settings['network.bridge_host']}:{_settings['network.bridge_port']}"
+
+POOL_LIMIT = 32            # Open sockets per pool
+POOL_LIMIT_PER_HOST = 8
+KEEPALIVE_TIMEOUT = 60     # Seconds an idle socket stays in the pool
+CONNECT_TIMEOUT = 5
+
+class HostPool:
+    """
+    Long-lived, keep-alive connection pool for one upstream host.
+    Async calls share one aiohttp session; sync calls share one requests session.
+    """
+    def __init__(self, base_url, timeout=60, connect_timeout=CONNECT_TIMEOUT,
+                 limit=POOL_LIMIT, limit_per_host=POOL_LIMIT_PER_HOST, keepalive_timeout=KEEPALIVE_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.owner = None  # Whoever created the pool through get_pool; only it should close it
+        self._session = None
+        self._session_loop = None
+        self._sync_session = None
+
+    def _client_timeout(self, timeout):
+        return aiohttp.ClientTimeout(total=timeout if timeout is not None else self.timeout,
+                                     sock_connect=self.connect_timeout)
+
+    def session(self):
+        """Returns the pooled aiohttp session, (re)creating it for the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._client_timeout(None))
+            self._session_loop = loop
+        return self._session
+
+    def request(self, method, path, timeout=None, **kwargs):
+        """Use as `async with pool.request(...) as resp:`."""
+        return self.session().request(method, f"{self.base_url}{path}",
+                                      timeout=self._client_timeout(timeout), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def post_sync(self, path, timeout=None, **kwargs):
+        """Blocking POST over a pooled requests session (imported on first use)."""
+        if self._sync_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._sync_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.limit_per_host)
+            self._sync_session.mount("http://", adapter)
+            self._sync_session.mount("https://", adapter)
+        return self._sync_session.post(f"{self.base_url}{path}",
+                                       timeout=(self.connect_timeout, timeout or self.timeout), **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+
+_POOLS = {}
+
+def get_pool(base_url, owner=None, **kwargs):
+    """
+    Returns the shared pool for base_url, creating it with kwargs on first use.
+    The first caller's owner is recorded on the pool (see HostPool.owner);
+    options that disagree with an existing pool's are reported and ignored.
+    """
+    key = base_url.rstrip("/")
+    pool = _POOLS.get(key)
+    if pool is None:
+        pool = _POOLS[key] = HostPool(key, **kwargs)
+        pool.owner = owner
+        return pool
+    differing = {name: value for name, value in kwargs.items() if getattr(pool, name, None) != value}
+    if differing:
+        print(f"[!] Pool for {key} already exists; ignoring "
+              + ", ".join(f"{name}={value!r} (pool has {getattr(pool, name, None)!r})" for name, value in differing.items()))
+    return pool
+
+async def close_all():
+    """Closes every pool. Call once on shutdown."""
+    for pool in list(_POOLS.values()):
+        await pool.close()
+    _POOLS.clear()
+
+# --- LATENCY DEMO (local stub, no Ollama or Kali needed) ---
+
+async def _demo(calls=200):
+    from aiohttp import web
+
+    async def fake_exec(request):
+        await request.json()
+        return web.json_response({"stdout": "ok", "stderr": "", "exit_code": 0})
+
+    app = web.Application()
+    app.add_routes([web.post("/exec", fake_exec)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{url}/exec", json={"command": "true"}) as resp:
+                await resp.json()
+    fresh_ms = (time.perf_counter() - start) * 1000 / calls
+
+    pool = get_pool(url)
+    start = time.perf_counter()
+    for _ in range(calls):
+        async with pool.post("/exec", json={"command": "true"}) as resp:
+            await resp.json()
+    pooled_ms = (time.perf_counter() - start) * 1000 / calls
+
+    await close_all()
+    await runner.cleanup()
+    print(f"[*] Session per call: {fresh_ms:.2f} ms/call")
+    print(f"[*] Pooled keep-alive: {pooled_ms:.2f} ms/call ({fresh_ms / pooled_ms:.1f}x faster)")
+
+if __name__ == "__main__":
+    asyncio.run(_demo())